@@ -1,13 +1,1507 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import json
-from datetime import datetime
+import bisect
+import heapq
+import random
+import zlib
+import threading
+import re
+import collections
+import hashlib
+from datetime import datetime, date, timedelta, timezone
+import calendar
 import os
 import shutil
 import logging
 from logging.handlers import RotatingFileHandler
 import sys
 import traceback
+import argparse
+import csv
+import io
+import tempfile
+import time
+
+# Приоритеты задач в порядке убывания важности
+PRIORITIES = ("high", "normal", "low")
+PRIORITY_LABELS = {"high": "Высокий", "normal": "Обычный", "low": "Низкий"}
+PRIORITY_MARKS = {"high": "▲", "normal": "", "low": "▼"}
+
+# Режимы группировки списка задач
+GROUP_NONE = "Без группировки"
+GROUP_PRIORITY = "По приоритету"
+GROUP_TAGS = "По тегам"
+ALL_TAGS = "Все теги"
+
+COLUMN_TITLES = {
+    "Order": "≡",
+    "Status": "Статус",
+    "Priority": "Приор.",
+    "Task": "Задача",
+    "Tags": "Теги",
+    "Date": "Дата",
+}
+
+
+class TaskStats:
+    """Сводные показатели по текущим задачам, обновляемые за O(1) при каждом изменении"""
+
+    def __init__(self):
+        self.open_count = 0
+        self.completed_count = 0
+        self.open_day_sum = 0
+        self.open_dated = 0
+        self._entries = {}
+
+    def add(self, task):
+        day = self._ordinal((task.get("created_at") or "")[:10])
+        if task["completed"]:
+            self.completed_count += 1
+        else:
+            self.open_count += 1
+            if day is not None:
+                self.open_day_sum += day
+                self.open_dated += 1
+        self._entries[task["id"]] = (day, bool(task["completed"]))
+
+    def remove(self, task_id):
+        day, completed = self._entries.pop(task_id)
+        if completed:
+            self.completed_count -= 1
+        else:
+            self.open_count -= 1
+            if day is not None:
+                self.open_day_sum -= day
+                self.open_dated -= 1
+
+    def average_open_age(self, today=None):
+        """Средний возраст незавершенных задач в днях (от создания)"""
+        if not self.open_dated:
+            return 0.0
+        today = today or date.today()
+        return today.toordinal() - self.open_day_sum / self.open_dated
+
+    @staticmethod
+    def _ordinal(day):
+        try:
+            return datetime.strptime(day, "%Y-%m-%d").toordinal()
+        except (TypeError, ValueError):
+            return None
+
+
+class TaskActivity:
+    """Счетчики событий по дням: сколько задач добавлено и выполнено
+
+    Считаются события, а не текущие задачи, поэтому удаление задачи не
+    меняет прошлую статистику. Счетчики хранятся в отдельном файле.
+    """
+
+    KEEP_DAYS = 366
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger or logging.getLogger('todo_app')
+        self.added_per_day = {}
+        self.completed_per_day = {}
+        self.dirty = False
+
+    def load(self, tasks):
+        """Чтение счетчиков; при первом запуске они восстанавливаются по задачам"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.added_per_day = dict(data["added"])
+            self.completed_per_day = dict(data["completed"])
+            return
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Счетчики статистики не прочитаны, пересчет по задачам: {str(e)}")
+        self.added_per_day = {}
+        self.completed_per_day = {}
+        for task in tasks:
+            self.task_added(task)
+            if task["completed"]:
+                self.task_completed(task)
+
+    def task_added(self, task):
+        self._bump(self.added_per_day, task["created_at"][:10], 1)
+
+    def task_completed(self, task, delta=1):
+        """Учет выполнения (delta=-1 - отмена отметки в тот же счетчик)"""
+        day = (task.get("completed_at") or "")[:10]
+        if day and (delta > 0 or self.completed_per_day.get(day, 0) > 0):
+            self._bump(self.completed_per_day, day, delta)
+
+    def daily(self, days=14, today=None):
+        """Добавлено и выполнено по дням за последние days дней"""
+        today = today or date.today()
+        result = []
+        for offset in range(days):
+            day = (today - timedelta(days=offset)).strftime("%Y-%m-%d")
+            result.append((day, self.added_per_day.get(day, 0), self.completed_per_day.get(day, 0)))
+        return result
+
+    def save(self, today=None):
+        """Запись счетчиков, если они менялись; старые дни отбрасываются"""
+        if not self.dirty:
+            return
+        oldest = ((today or date.today()) - timedelta(days=self.KEEP_DAYS)).strftime("%Y-%m-%d")
+        for counter in (self.added_per_day, self.completed_per_day):
+            for day in [day for day in counter if day < oldest]:
+                del counter[day]
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"added": self.added_per_day, "completed": self.completed_per_day}, f)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            self.logger.error(f"Ошибка при сохранении счетчиков статистики: {str(e)}")
+
+    def _bump(self, counter, key, delta):
+        value = counter.get(key, 0) + delta
+        if value:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+        self.dirty = True
+
+
+class TaskIndex:
+    """Вторичные индексы задач, обновляемые инкрементально"""
+
+    # Ключи сортировки для каждой колонки
+    SORT_KEYS = {
+        "Order": lambda t: t["rank"],
+        "Status": lambda t: (t["completed"], t["date"]),
+        "Priority": lambda t: PRIORITIES.index(t["priority"]),
+        "Task": lambda t: t["text"].lower(),
+        "Tags": lambda t: ", ".join(t["tags"]).lower(),
+        "Date": lambda t: t["date"],
+    }
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_tag = {}
+        self.untagged = set()
+        self.by_priority = {priority: set() for priority in PRIORITIES}
+        self.roots = set()
+        self.by_text = {}
+        self.children = {}
+        self.done_children = {}
+        self.stats = TaskStats()
+        self._sorted = {column: [] for column in self.SORT_KEYS}
+        self._entries = {}
+
+    def rebuild(self, tasks):
+        """Полное построение индексов (только при загрузке)"""
+        self.__init__()
+        for task in tasks:
+            self._index(task)
+        for entries in self._sorted.values():
+            entries.sort()
+
+    def add(self, task):
+        """Добавление задачи в индексы"""
+        self._index(task, insort=True)
+
+    def remove(self, task_id):
+        """Удаление задачи из индексов"""
+        self.by_id.pop(task_id, None)
+        keys, tags, priority, parent, completed, text_key = self._entries.pop(task_id)
+        self.stats.remove(task_id)
+        same_text = self.by_text[text_key]
+        same_text.discard(task_id)
+        if not same_text:
+            del self.by_text[text_key]
+        for tag in tags:
+            ids = self.by_tag[tag]
+            ids.discard(task_id)
+            if not ids:
+                del self.by_tag[tag]
+        if not tags:
+            self.untagged.discard(task_id)
+        self.by_priority[priority].discard(task_id)
+        if parent is None:
+            self.roots.discard(task_id)
+        else:
+            siblings = self.children[parent]
+            siblings.discard(task_id)
+            self.done_children[parent] -= completed
+            if not siblings:
+                del self.children[parent]
+                del self.done_children[parent]
+        for column, entry in keys.items():
+            entries = self._sorted[column]
+            del entries[bisect.bisect_left(entries, entry)]
+
+    def reindex(self, task):
+        """Обновление индексов после изменения задачи"""
+        self.remove(task["id"])
+        self.add(task)
+
+    def ordered(self, column, reverse=False, ids=None):
+        """Задачи в порядке колонки, при необходимости только из ids"""
+        entries = self._sorted[column]
+        if ids is not None and len(ids) * 8 < len(entries):
+            # Small subsets (children of one task, a rare tag) are cheaper
+            # to sort by their stored keys than to filter the whole column
+            chosen = sorted((self._entries[task_id][0][column] for task_id in ids), reverse=reverse)
+            return [self.by_id[task_id] for _, task_id in chosen]
+        if reverse:
+            entries = reversed(entries)
+        if ids is None:
+            return [self.by_id[task_id] for _, task_id in entries]
+        return [self.by_id[task_id] for _, task_id in entries if task_id in ids]
+
+    def tags(self):
+        return sorted(self.by_tag, key=str.lower)
+
+    def find_duplicates(self, text, exclude_id=None):
+        """Незавершенные задачи с тем же текстом без учета регистра и пробелов"""
+        ids = self.by_text.get(normalize_text(text), ())
+        return [self.by_id[task_id] for task_id in ids
+                if task_id != exclude_id and not self.by_id[task_id]["completed"]]
+
+    def progress(self, task_id):
+        """Число выполненных и всех подзадач задачи"""
+        children = self.children.get(task_id)
+        if not children:
+            return 0, 0
+        return self.done_children[task_id], len(children)
+
+    def descendants(self, task_id):
+        """Идентификаторы всех подзадач на любом уровне вложенности"""
+        stack = list(self.children.get(task_id, ()))
+        while stack:
+            child_id = stack.pop()
+            yield child_id
+            stack.extend(self.children.get(child_id, ()))
+
+    def last_rank(self):
+        """Ключ последней задачи в ручном порядке"""
+        entries = self._sorted["Order"]
+        return entries[-1][0] if entries else ""
+
+    def _index(self, task, insort=False):
+        task_id = task["id"]
+        self.by_id[task_id] = task
+        for tag in task["tags"]:
+            self.by_tag.setdefault(tag, set()).add(task_id)
+        if not task["tags"]:
+            self.untagged.add(task_id)
+        self.by_priority[task["priority"]].add(task_id)
+        parent = task.get("parent")
+        if parent is None:
+            self.roots.add(task_id)
+        else:
+            self.children.setdefault(parent, set()).add(task_id)
+            self.done_children[parent] = self.done_children.get(parent, 0) + task["completed"]
+        keys = {}
+        for column, key_func in self.SORT_KEYS.items():
+            entry = (key_func(task), task_id)
+            if insort:
+                bisect.insort(self._sorted[column], entry)
+            else:
+                self._sorted[column].append(entry)
+            keys[column] = entry
+        text_key = normalize_text(task["text"])
+        self.by_text.setdefault(text_key, set()).add(task_id)
+        self._entries[task_id] = (keys, tuple(task["tags"]), task["priority"], parent, bool(task["completed"]), text_key)
+        self.stats.add(task)
+
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+RECURRENCE_FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+RECURRENCE_LABELS = {"DAILY": "Ежедневно", "WEEKLY": "Еженедельно", "MONTHLY": "Ежемесячно"}
+
+
+class RecurrenceRule:
+    """Правило повторения - подмножество RRULE
+
+    Поддерживаются FREQ (DAILY, WEEKLY, MONTHLY), INTERVAL, BYDAY (для WEEKLY),
+    BYMONTHDAY (для MONTHLY), COUNT и UNTIL (в формате ГГГГММДД).
+    Хранится только правило; экземпляры задач создаются по одному.
+    """
+
+    def __init__(self, freq, interval=1, byday=(), bymonthday=None, count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(byday, key=WEEKDAYS.index))
+        self.bymonthday = bymonthday
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        text = text.upper().replace(" ", "")
+        if text.startswith("RRULE:"):
+            text = text[len("RRULE:"):]
+        parts = {}
+        for part in text.split(";"):
+            if not part:
+                continue
+            name, sep, value = part.partition("=")
+            if not sep or not value:
+                raise ValueError(f"Некорректная часть правила: {part}")
+            parts[name] = value
+        freq = parts.pop("FREQ", None)
+        if freq not in RECURRENCE_FREQUENCIES:
+            raise ValueError(f"Неподдерживаемая частота: {freq}")
+        try:
+            interval = int(parts.pop("INTERVAL", "1"))
+            count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+            bymonthday = int(parts.pop("BYMONTHDAY")) if "BYMONTHDAY" in parts else None
+            until = datetime.strptime(parts.pop("UNTIL"), "%Y%m%d").date() if "UNTIL" in parts else None
+        except ValueError:
+            raise ValueError("Некорректное числовое значение или дата в правиле") from None
+        byday = parts.pop("BYDAY", "").split(",") if "BYDAY" in parts else []
+        if parts:
+            raise ValueError(f"Неподдерживаемые параметры: {', '.join(parts)}")
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("INTERVAL и COUNT должны быть положительными")
+        if bymonthday is not None and not 1 <= bymonthday <= 31:
+            raise ValueError("BYMONTHDAY должен быть от 1 до 31")
+        if any(day not in WEEKDAYS for day in byday):
+            raise ValueError(f"Некорректный день недели в BYDAY: {','.join(byday)}")
+        # step() would silently ignore these, while iCalendar readers would not
+        if byday and freq != "WEEKLY":
+            raise ValueError("BYDAY поддерживается только с FREQ=WEEKLY")
+        if bymonthday is not None and freq != "MONTHLY":
+            raise ValueError("BYMONTHDAY поддерживается только с FREQ=MONTHLY")
+        return cls(freq, interval, byday, bymonthday, count, until)
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append(f"BYDAY={','.join(self.byday)}")
+        if self.bymonthday is not None:
+            parts.append(f"BYMONTHDAY={self.bymonthday}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}")
+        return ";".join(parts)
+
+    def step(self, current):
+        """Дата экземпляра, следующего сразу за current, или None, если его нет
+
+        Как в RFC 5545, месяцы без нужного числа (31 февраля) пропускаются,
+        а не заменяются последним днем месяца.
+        """
+        if self.freq == "DAILY":
+            return current + timedelta(days=self.interval)
+        if self.freq == "WEEKLY":
+            if not self.byday:
+                return current + timedelta(weeks=self.interval)
+            days = [WEEKDAYS.index(day) for day in self.byday]
+            later = [day for day in days if day > current.weekday()]
+            if later:
+                return current + timedelta(days=later[0] - current.weekday())
+            week_start = current - timedelta(days=current.weekday())
+            return week_start + timedelta(weeks=self.interval, days=days[0])
+        # Without BYMONTHDAY the series keeps the day of its first occurrence,
+        # which never drifts because months lacking it are skipped
+        day = self.bymonthday or current.day
+        month_index = current.year * 12 + current.month - 1
+        # The month sequence repeats within 12 steps, so a day that fits none is never reached
+        for _ in range(12):
+            month_index += self.interval
+            year, month = divmod(month_index, 12)
+            if day <= calendar.monthrange(year, month + 1)[1]:
+                return date(year, month + 1, day)
+        return None
+
+    def advance(self, current, today):
+        """Следующий экземпляр не раньше today
+
+        Возвращает (дата, правило для следующего экземпляра) или None,
+        если серия закончилась. Пропущенные экземпляры расходуют COUNT.
+        """
+        count = self.count
+        following = current
+        while True:
+            if count is not None:
+                count -= 1
+                if count < 1:
+                    return None
+            following = self.step(following)
+            if following is None or (self.until is not None and following > self.until):
+                return None
+            if following >= today:
+                break
+        rule = RecurrenceRule(self.freq, self.interval, self.byday, self.bymonthday, count, self.until)
+        return following, rule
+
+
+# Ключи ручного порядка: дроби в системе счисления по основанию 62,
+# сравниваемые как строки. Ключи никогда не заканчиваются на "0",
+# поэтому между любыми двумя ключами всегда есть место для нового.
+RANK_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+RANK_REBALANCE_LENGTH = 16
+
+
+def rank_between(lower, upper):
+    """Ключ строго между lower и upper ("" - начало списка, None - конец)"""
+    prefix = ""
+    position = 0
+    while True:
+        low = RANK_DIGITS.index(lower[position]) if position < len(lower) else 0
+        if upper is not None and position < len(upper):
+            high = RANK_DIGITS.index(upper[position])
+        else:
+            high = len(RANK_DIGITS)
+        if low == high:
+            prefix += RANK_DIGITS[low]
+        elif high - low > 1:
+            return prefix + RANK_DIGITS[(low + high) // 2]
+        else:
+            # Adjacent digits: keep the lower one, then anything above lower fits
+            prefix += RANK_DIGITS[low]
+            upper = None
+        position += 1
+
+
+def rank_after(lower):
+    """Ключ после lower для добавления в конец: +1 в младшем разряде"""
+    for position in range(len(lower) - 1, -1, -1):
+        digit = RANK_DIGITS.index(lower[position])
+        if digit < len(RANK_DIGITS) - 1:
+            return lower[:position] + RANK_DIGITS[digit + 1]
+    return lower + RANK_DIGITS[1]
+
+
+def rank_sequence(count):
+    """Равномерно распределенные ключи для count задач
+
+    Ключи занимают нижнюю половину пространства, чтобы оставить место
+    для добавления в конец без удлинения ключей.
+    """
+    base = len(RANK_DIGITS)
+    width = 1
+    while base ** width < 2 * base * (count + 1):
+        width += 1
+    step = base ** width // 2 // (count + 1)
+    ranks = []
+    for number in range(1, count + 1):
+        value = number * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, base)
+            digits.append(RANK_DIGITS[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+def normalize_text(text):
+    """Текст задачи без учета регистра и лишних пробелов"""
+    return " ".join(text.casefold().split())
+
+
+class CompletionIndex:
+    """Индекс автодополнения по всем когда-либо введенным задачам
+
+    Нормализованные тексты хранятся в отсортированном списке, поэтому
+    варианты для префикса - это непрерывный диапазон, найденный bisect.
+    Для префиксов с большим диапазоном лучшие варианты кэшируются и
+    обновляются при каждом добавлении, как вершины префиксного дерева.
+    """
+
+    CACHE_THRESHOLD = 64
+
+    def __init__(self, limit=8):
+        self.limit = limit
+        self.counts = {}
+        self.keys = []
+        self.top = {}
+
+    def rebuild(self, texts):
+        """Построение индекса по истории целиком (только при загрузке)"""
+        self.counts = {}
+        for text in texts:
+            self._count(text)
+        self.keys = sorted(self.counts)
+        self.top = {}
+
+    def add(self, text):
+        """Учет нового или повторно введенного текста"""
+        key = normalize_text(text)
+        if not key:
+            return
+        if key not in self.counts:
+            bisect.insort(self.keys, key)
+        entry = self._count(text)
+        # Counts only grow, so each cached top list can be patched in place
+        for length in range(1, len(key) + 1):
+            top = self.top.get(key[:length])
+            if top is None:
+                continue
+            if key not in top:
+                top.append(key)
+            top.sort(key=self._rank)
+            del top[self.limit:]
+        return entry
+
+    def suggest(self, prefix):
+        """Лучшие варианты для префикса, от самых частых к редким"""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        top = self.top.get(prefix)
+        if top is None:
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", start)
+            top = heapq.nsmallest(self.limit, self.keys[start:end], key=self._rank)
+            if end - start > self.CACHE_THRESHOLD:
+                self.top[prefix] = top
+        return [self.counts[key][1] for key in top]
+
+    def _count(self, text):
+        key = normalize_text(text)
+        entry = self.counts.get(key)
+        if entry is None:
+            entry = self.counts[key] = [0, text]
+        entry[0] += 1
+        entry[1] = text
+        return entry
+
+    def _rank(self, key):
+        return (-self.counts[key][0], key)
+
+
+def find_near_duplicates(items, threshold=0.6, permutations=32, bands=8):
+    """Поиск похожих задач: MinHash по символьным 3-граммам и LSH по полосам
+
+    items - пары (идентификатор, текст). Возвращает список
+    (сходство, id1, id2) по убыванию сходства Жаккара.
+    """
+    rows = permutations // bands
+    prime = (1 << 61) - 1
+    generator = random.Random(42)
+    coefficients = [(generator.randrange(1, prime), generator.randrange(prime)) for _ in range(permutations)]
+    shingle_sets = {}
+    buckets = {}
+    for item_id, text in items:
+        key = normalize_text(text)
+        shingles = {key[i:i + 3] for i in range(max(1, len(key) - 2))}
+        shingle_sets[item_id] = shingles
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        signature = [min((a * h + b) % prime for h in hashes) for a, b in coefficients]
+        for band in range(bands):
+            bucket = (band, tuple(signature[band * rows:(band + 1) * rows]))
+            buckets.setdefault(bucket, []).append(item_id)
+
+    # Only pairs that share at least one band are compared exactly
+    candidates = set()
+    for ids in buckets.values():
+        for position, first in enumerate(ids):
+            for second in ids[position + 1:]:
+                candidates.add((min(first, second), max(first, second)))
+    pairs = []
+    for first, second in candidates:
+        a, b = shingle_sets[first], shingle_sets[second]
+        similarity = len(a & b) / len(a | b)
+        if similarity >= threshold:
+            pairs.append((similarity, first, second))
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    return pairs
+
+
+def parse_tags(text):
+    """Разбор строки тегов: разделители - запятые и пробелы, '#' необязателен"""
+    tags = []
+    for word in text.replace(",", " ").split():
+        tag = word.lstrip("#")
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+# Уровни надёжности сохранения (от быстрого к самому надёжному)
+DURABILITY_LEVELS = ("fast", "normal", "full")
+SNAPSHOT_VERSION = 2
+
+DEFAULT_SETTINGS = {
+    "durability": "normal",
+    "generations": 3,
+    "history_keep_all_hours": 24,
+    "history_keep_days": 90,
+    "log_format": "text",
+}
+
+
+class SnapshotError(Exception):
+    """Снимок задач поврежден или не прошел проверку"""
+
+
+class SnapshotStore:
+    """Атомарное сохранение задач с контрольными суммами и ротацией поколений
+
+    Уровни надёжности:
+        fast   - атомарная замена файла без fsync
+        normal - fsync временного файла перед заменой
+        full   - дополнительно fsync каталога после замены
+    """
+
+    def __init__(self, path, generations=3, durability="normal", logger=None):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.temp_path = os.path.splitext(path)[0] + "_temp.json"
+        self.legacy_backup_path = path + ".backup"
+        self.generations = generations
+        self.durability = durability
+        self.generation = 0
+        self.logger = logger or logging.getLogger('todo_app')
+
+    def generation_path(self, number):
+        return f"{self.path}.{number}"
+
+    def save(self, tasks):
+        """Запись нового снимка: временный файл, ротация, атомарная замена"""
+        os.makedirs(self.directory, exist_ok=True)
+        generation = self.generation + 1
+        payload = json.dumps(tasks, ensure_ascii=False)
+        checksum = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        with open(self.temp_path, "w", encoding="utf-8") as f:
+            f.write(
+                f'{{"version": {SNAPSHOT_VERSION}, "generation": {generation}, '
+                f'"checksum": "{checksum}", "tasks": {payload}}}\n'
+            )
+            if self.durability != "fast":
+                f.flush()
+                os.fsync(f.fileno())
+        self.rotate()
+        os.replace(self.temp_path, self.path)
+        if self.durability == "full":
+            self.fsync_directory()
+        self.generation = generation
+
+    def rotate(self):
+        """Сдвиг поколений: tasks.json -> tasks.json.1 -> ... -> tasks.json.N
+
+        Сам tasks.json остается на месте до атомарной замены новым снимком,
+        поэтому основной файл существует в любой момент сохранения.
+        """
+        if self.generations < 1 or not os.path.exists(self.path):
+            return
+        for number in range(self.generations - 1, 0, -1):
+            source = self.generation_path(number)
+            if os.path.exists(source):
+                os.replace(source, self.generation_path(number + 1))
+        first = self.generation_path(1)
+        if os.path.exists(first):
+            # Only with a single generation: nothing was shifted out of the way
+            os.remove(first)
+        try:
+            os.link(self.path, first)
+        except OSError:
+            # No hard links on this file system
+            shutil.copyfile(self.path, first)
+
+    def promote(self):
+        """Завершение прерванного сохранения: временный файл становится tasks.json"""
+        self.rotate()
+        os.replace(self.temp_path, self.path)
+        if self.durability == "full":
+            self.fsync_directory()
+
+    def fsync_directory(self):
+        """Сброс на диск записи каталога (на Windows не поддерживается)"""
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def read(self, path):
+        """Чтение и проверка одного снимка, возвращает (поколение, задачи)"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            # Прежний формат: список задач без контрольной суммы
+            return 0, data
+        if not isinstance(data, dict) or not isinstance(data.get("tasks"), list):
+            raise SnapshotError(f"{path}: неизвестный формат файла")
+        # Version 1 snapshots were written with indent=2
+        indent = 2 if data.get("version") == 1 else None
+        payload = json.dumps(data["tasks"], ensure_ascii=False, indent=indent)
+        if hashlib.sha256(payload.encode("utf-8")).hexdigest() != data.get("checksum"):
+            raise SnapshotError(f"{path}: контрольная сумма не совпадает")
+        return data.get("generation", 0), data["tasks"]
+
+    def scan(self, path=None, predicate=None, chunk_size=64 * 1024, header=None):
+        """Потоковое чтение задач из снимка без загрузки всего файла в память
+
+        Задачи, для которых predicate возвращает False, отбрасываются сразу
+        после разбора. Контрольная сумма проверяется по мере чтения, и при
+        несовпадении в конце выбрасывается SnapshotError. Если передан словарь
+        header, в него записываются поля заголовка снимка.
+        """
+        path = path or self.path
+        decoder = json.JSONDecoder()
+        digest = hashlib.sha256()
+        with open(path, "r", encoding="utf-8") as f:
+            buffer = ""
+            checksum = None
+            while True:
+                chunk = f.read(chunk_size)
+                buffer += chunk
+                stripped = buffer.lstrip()
+                if stripped.startswith("["):
+                    # Old format: a bare list without checksum
+                    start = buffer.find("[")
+                    break
+                marker = buffer.find('"tasks": ')
+                if stripped.startswith("{") and marker >= 0:
+                    # Snapshot header: everything before the "tasks" payload
+                    fields = json.loads(buffer[:marker].rstrip().rstrip(",") + "}")
+                    if header is not None:
+                        header.update(fields)
+                    checksum = fields.get("checksum")
+                    start = marker + len('"tasks": ')
+                    break
+                if not chunk or (stripped and stripped[0] not in "[{"):
+                    raise SnapshotError(f"{path}: неизвестный формат файла")
+            while start >= len(buffer) and chunk:
+                chunk = f.read(chunk_size)
+                buffer += chunk
+            if buffer[start:start + 1] != "[":
+                raise SnapshotError(f"{path}: неизвестный формат файла")
+            payload_start = start
+            position = start + 1
+            eof = False
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer) and buffer[position] == "]":
+                    break
+                try:
+                    if position >= len(buffer):
+                        raise ValueError("buffer exhausted")
+                    task, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    if eof:
+                        raise SnapshotError(f"{path}: файл обрезан или поврежден")
+                    # Drop the consumed prefix and read the next chunk
+                    digest.update(buffer[payload_start:position].encode("utf-8"))
+                    chunk = f.read(chunk_size)
+                    eof = not chunk
+                    buffer = buffer[position:] + chunk
+                    payload_start = position = 0
+                    continue
+                position = end
+                if predicate is None or predicate(task):
+                    yield task
+            digest.update(buffer[payload_start:position + 1].encode("utf-8"))
+        if checksum is not None and digest.hexdigest() != checksum:
+            raise SnapshotError(f"{path}: контрольная сумма не совпадает")
+
+    def verify(self, path):
+        """Потоковая проверка снимка без загрузки задач, возвращает (поколение, None)"""
+        header = {}
+        for _ in self.scan(path, predicate=lambda task: False, header=header):
+            pass
+        return header.get("generation", 0), None
+
+    def source(self):
+        """Снимок, который выбрал бы load(), или None; задачи в память не загружаются"""
+        newest = self.newest(self.verify)
+        return newest[2] if newest is not None else None
+
+    def candidates(self):
+        """Файлы снимков от новейшего к самому старому"""
+        yield self.path
+        for number in range(1, self.generations + 1):
+            yield self.generation_path(number)
+        yield self.legacy_backup_path
+
+    def newest(self, read):
+        """Выбор новейшего корректного снимка с помощью функции чтения read
+
+        Возвращает (поколение, данные, путь) или None, если снимков еще нет.
+        Если файлы есть, но ни один не прошел проверку, выбрасывает SnapshotError.
+        """
+        newest = None
+        # A valid temp file is a finished save interrupted before the rename
+        if os.path.exists(self.temp_path):
+            try:
+                generation, tasks = read(self.temp_path)
+                newest = (generation, tasks, self.temp_path)
+            except (ValueError, SnapshotError) as e:
+                self.logger.warning(f"Временный файл отклонен: {str(e)}")
+
+        found = newest is not None
+        for path in self.candidates():
+            if not os.path.exists(path):
+                continue
+            found = True
+            try:
+                generation, tasks = read(path)
+            except (ValueError, SnapshotError) as e:
+                self.logger.warning(f"Снимок {path} отклонен: {str(e)}")
+                continue
+            if newest is None or generation >= newest[0]:
+                newest = (generation, tasks, path)
+            break
+
+        if newest is None and found:
+            raise SnapshotError("Не найдено ни одного корректного снимка задач")
+        return newest
+
+    def load(self):
+        """Загрузка новейшего корректного снимка
+
+        Возвращает (задачи, путь) или (None, None), если снимков еще нет.
+        Уцелевший временный файл сразу становится основным, чтобы следующее
+        сохранение не перезаписало единственную копию последних изменений.
+        """
+        newest = self.newest(self.read)
+        if newest is None:
+            return None, None
+        generation, tasks, path = newest
+        if path == self.temp_path:
+            try:
+                self.promote()
+                path = self.path
+            except OSError as e:
+                self.logger.warning(f"Не удалось восстановить временный файл: {str(e)}")
+        self.generation = generation
+        return tasks, path
+
+
+# Как часто очищать историю версий во время работы приложения (мс)
+HISTORY_PRUNE_INTERVAL = 60 * 60 * 1000
+
+
+class VersionHistory:
+    """История версий списка задач с адресацией по содержимому
+
+    Каждая задача хранится как сжатый объект, имя которого - SHA-256
+    его содержимого. Список хэшей разбивается на фрагменты по границам,
+    зависящим от содержимого, и фрагменты собираются в дерево, поэтому
+    новая версия добавляет только измененные задачи и несколько узлов
+    дерева. Версия - это строка в versions.jsonl со ссылкой на корень.
+    """
+
+    CHUNK_MASK = 31
+    MIN_CHUNK = 4
+    MAX_CHUNK = 256
+
+    def __init__(self, directory, logger=None):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.versions_file = os.path.join(directory, "versions.jsonl")
+        self.logger = logger or logging.getLogger('todo_app')
+        # Objects of the last recorded version; anything older is checked on disk
+        self.known = set()
+        self.recorded = set()
+        self.last_root = None
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put(self, data):
+        """Запись объекта, если его еще нет; возвращает хэш"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if digest not in self.known and digest not in self.recorded and not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(zlib.compress(data))
+            os.replace(path + ".tmp", path)
+        self.recorded.add(digest)
+        return digest
+
+    def get(self, digest):
+        with open(self.object_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f"Объект истории {digest} поврежден")
+        return data
+
+    def stored_objects(self):
+        if not os.path.isdir(self.objects_dir):
+            return
+        for prefix in os.listdir(self.objects_dir):
+            for name in os.listdir(os.path.join(self.objects_dir, prefix)):
+                if not name.endswith(".tmp"):
+                    yield prefix + name
+
+    def build_tree(self, hashes):
+        """Сборка дерева фрагментов над списком хэшей задач"""
+        level = 0
+        while True:
+            nodes = []
+            chunk = []
+            for digest in hashes:
+                chunk.append(digest)
+                boundary = int(digest[:8], 16) & self.CHUNK_MASK == 0
+                if (boundary and len(chunk) >= self.MIN_CHUNK) or len(chunk) >= self.MAX_CHUNK:
+                    nodes.append(chunk)
+                    chunk = []
+            if chunk or not nodes:
+                nodes.append(chunk)
+            hashes = [self.put(json.dumps({"level": level, "items": node}).encode("utf-8")) for node in nodes]
+            if len(hashes) == 1:
+                return hashes[0]
+            level += 1
+
+    def record(self, tasks):
+        """Сохранение версии; одинаковые версии подряд не дублируются"""
+        self.recorded = set()
+        try:
+            task_hashes = [
+                self.put(json.dumps(task, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+                for task in tasks
+            ]
+            root = self.build_tree(task_hashes)
+            # Memory stays proportional to the current list, not to the whole history
+            self.known = self.recorded
+        finally:
+            self.recorded = set()
+        if self.last_root is None:
+            versions = self.versions()
+            self.last_root = versions[-1]["root"] if versions else ""
+        if root == self.last_root:
+            return None
+        version = {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "root": root, "count": len(tasks)}
+        with open(self.versions_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(version) + "\n")
+        self.last_root = root
+        return version
+
+    def versions(self):
+        """Список версий от старых к новым"""
+        if not os.path.exists(self.versions_file):
+            return []
+        versions = []
+        with open(self.versions_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    versions.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a crash is skipped
+                    self.logger.warning(f"Пропущена поврежденная запись истории: {line.strip()}")
+        return versions
+
+    def walk(self, root):
+        """Хэши всех узлов и задач версии"""
+        stack = [root]
+        while stack:
+            digest = stack.pop()
+            yield digest
+            node = json.loads(self.get(digest))
+            if node["level"] > 0:
+                stack.extend(node["items"])
+            else:
+                yield from node["items"]
+
+    def load(self, root):
+        """Восстановление списка задач версии"""
+        node = json.loads(self.get(root))
+        hashes = node["items"]
+        for _ in range(node["level"]):
+            hashes = [item for digest in hashes for item in json.loads(self.get(digest))["items"]]
+        return [json.loads(self.get(digest)) for digest in hashes]
+
+    def prune(self, keep_all_hours=24, keep_days=90, now=None):
+        """Удаление старых версий и объектов, на которые они больше не ссылаются
+
+        Все версии хранятся keep_all_hours часов, затем по одной (последней)
+        за день до keep_days дней. Самая новая версия хранится всегда.
+        """
+        versions = self.versions()
+        if not versions:
+            return 0
+        now = now or datetime.now()
+        kept = []
+        last_per_day = {}
+        for number, version in enumerate(versions):
+            age = now - datetime.strptime(version["time"], "%Y-%m-%d %H:%M:%S")
+            if age <= timedelta(hours=keep_all_hours) or number == len(versions) - 1:
+                kept.append(version)
+            elif age <= timedelta(days=keep_days):
+                last_per_day[version["time"][:10]] = version
+        kept = sorted(list(last_per_day.values()) + kept, key=lambda v: v["time"])
+        removed = len(versions) - len(kept)
+        if not removed:
+            return 0
+
+        temp_file = self.versions_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(version) + "\n" for version in kept)
+        os.replace(temp_file, self.versions_file)
+
+        reachable = set()
+        for version in kept:
+            reachable.update(self.walk(version["root"]))
+        for digest in list(self.stored_objects()):
+            if digest not in reachable:
+                os.remove(self.object_path(digest))
+        self.known &= reachable
+        return removed
+
+
+# Статусы для фильтра экспорта
+EXPORT_STATUSES = ("all", "open", "done")
+ICAL_PRIORITIES = {"high": 1, "normal": 5, "low": 9}
+
+
+def task_filter(status="all", date_from=None, date_to=None):
+    """Предикат отбора задач по статусу и диапазону дат (ГГГГ-ММ-ДД)"""
+    def predicate(task):
+        if status == "open" and task.get("completed"):
+            return False
+        if status == "done" and not task.get("completed"):
+            return False
+        task_date = task.get("date", "")
+        if date_from and task_date < date_from:
+            return False
+        if date_to and task_date > date_to:
+            return False
+        return True
+    return predicate
+
+
+def export_csv(tasks):
+    """Строки CSV: по одной строке на задачу"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(("id", "parent", "text", "completed", "date", "priority", "tags", "recurrence"))
+    yield buffer.getvalue()
+    for task in tasks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow((
+            task.get("id", ""),
+            task.get("parent", ""),
+            task.get("text", ""),
+            int(bool(task.get("completed"))),
+            task.get("date", ""),
+            task.get("priority", "normal"),
+            ",".join(task.get("tags", [])),
+            task.get("recurrence", "")
+        ))
+        yield buffer.getvalue()
+
+
+def export_markdown(tasks):
+    """Список задач в виде чек-листа Markdown"""
+    yield "# Список задач\n\n"
+    for task in tasks:
+        mark = "x" if task.get("completed") else " "
+        text = task.get("text", "").replace("\n", " ")
+        tags = "".join(f" #{tag}" for tag in task.get("tags", []))
+        yield f"- [{mark}] {text}{tags} ({task.get('date', '')})\n"
+
+
+def ical_escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def ical_fold(line):
+    """Перенос строк iCalendar длиннее 75 октетов (RFC 5545, 3.1)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Do not split a multi-byte UTF-8 sequence
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def export_icalendar(tasks):
+    """Задачи в формате iCalendar (VTODO)"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//todo_app//RU\r\n"
+    for task in tasks:
+        lines = [
+            "BEGIN:VTODO",
+            f"UID:todo-{task.get('id', '')}@todo_app",
+            f"DTSTAMP:{stamp}",
+            f"SUMMARY:{ical_escape(task.get('text', ''))}",
+            f"STATUS:{'COMPLETED' if task.get('completed') else 'NEEDS-ACTION'}",
+            f"PRIORITY:{ICAL_PRIORITIES.get(task.get('priority'), 5)}",
+        ]
+        rule = None
+        if task.get("recurrence"):
+            try:
+                rule = RecurrenceRule.parse(task["recurrence"])
+            except ValueError:
+                # Rules saved before validation was tightened are left out
+                pass
+        if task.get("date"):
+            # A series is anchored by DTSTART; DUE on the same day would break
+            # the DUE > DTSTART requirement of RFC 5545, 3.8.2.3
+            field = "DTSTART" if rule is not None else "DUE"
+            lines.append(f"{field};VALUE=DATE:{task['date'].replace('-', '')}")
+        if task.get("tags"):
+            lines.append("CATEGORIES:" + ",".join(ical_escape(tag) for tag in task["tags"]))
+        if rule is not None:
+            lines.append(f"RRULE:{rule}")
+        if task.get("parent") is not None:
+            lines.append(f"RELATED-TO:todo-{task['parent']}@todo_app")
+        lines.append("END:VTODO")
+        yield "".join(ical_fold(line) for line in lines)
+    yield "END:VCALENDAR\r\n"
+
+
+EXPORT_FORMATS = {
+    "csv": export_csv,
+    "md": export_markdown,
+    "ics": export_icalendar,
+}
+
+
+def export_tasks(tasks, path, export_format=None):
+    """Потоковая запись задач в файл; формат по умолчанию - по расширению
+
+    Запись идет во временный файл, который затем атомарно заменяет path,
+    поэтому прерванный экспорт не оставляет обрезанный файл.
+    Возвращает число записанных задач.
+    """
+    export_format = export_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат экспорта: {export_format}")
+    count = 0
+
+    def counted():
+        nonlocal count
+        for task in tasks:
+            count += 1
+            yield task
+
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="") as f:
+            for chunk in EXPORT_FORMATS[export_format](counted()):
+                f.write(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+LOG_FORMATS = ("text", "json")
+LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Типы событий лога по началу сообщения
+LOG_EVENT_PATTERNS = [
+    (re.compile(r"Приложение запущено"), "app_started"),
+    (re.compile(r"Загружено \d+ задач"), "tasks_loaded"),
+    (re.compile(r"Задачи успешно сохранены"), "save_ok"),
+    (re.compile(r"Добавлена новая задача"), "task_added"),
+    (re.compile(r"Добавлена подзадача"), "subtask_added"),
+    (re.compile(r"Изменен статус задачи"), "task_toggled"),
+    (re.compile(r"Задача отредактирована"), "task_edited"),
+    (re.compile(r"Удалена задача"), "task_deleted"),
+    (re.compile(r"Изменен(о|ы)? (приоритет|теги|повторение) задачи"), "task_updated"),
+    (re.compile(r"Задача '.*' перемещена"), "task_moved"),
+    (re.compile(r"Ошибка (прав доступа )?при сохранении( задач)?:"), "save_error"),
+    (re.compile(r"(Ошибка прав доступа|Непредвиденная ошибка|Ошибка проверки файлов задач) при загрузке"), "load_error"),
+    (re.compile(r"Восстановлена версия"), "version_restored"),
+    (re.compile(r"Экспортировано \d+ задач"), "export"),
+]
+TEXT_LOG_LINE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(?:,\d+)? - (\w+) - (.*)$")
+
+
+def classify_log_message(message):
+    """Тип события по тексту сообщения лога"""
+    for pattern, event in LOG_EVENT_PATTERNS:
+        if pattern.match(message):
+            return event
+    return "other"
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Запись лога в формате JSON Lines: одна запись - одна строка"""
+
+    def format(self, record):
+        message = record.getMessage()
+        entry = {
+            "time": self.formatTime(record, LOG_TIME_FORMAT),
+            "level": record.levelname,
+            "event": classify_log_message(message),
+            "message": message,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def iter_log_files(directory, base_name="todo_app.log"):
+    """Файлы лога от самого старого архива к текущему"""
+    numbered = []
+    for name in os.listdir(directory):
+        suffix = name[len(base_name) + 1:]
+        if name.startswith(base_name + ".") and suffix.isdigit():
+            numbered.append((int(suffix), name))
+    for _, name in sorted(numbered, reverse=True):
+        yield os.path.join(directory, name)
+    current = os.path.join(directory, base_name)
+    if os.path.exists(current):
+        yield current
+
+
+def parse_log_events(paths):
+    """Потоковый разбор строк лога (текстовых и JSON) в события
+
+    Возвращает кортежи (время, уровень, тип события, сообщение).
+    Строки продолжения (например, трассировки) пропускаются.
+    """
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("{"):
+                    try:
+                        entry = json.loads(line)
+                        moment = datetime.strptime(entry["time"], LOG_TIME_FORMAT)
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    message = entry.get("message", "")
+                    yield moment, entry.get("level", ""), entry.get("event") or classify_log_message(message), message
+                    continue
+                match = TEXT_LOG_LINE.match(line)
+                if match:
+                    moment = datetime.strptime(match.group(1), LOG_TIME_FORMAT)
+                    message = match.group(3)
+                    yield moment, match.group(2), classify_log_message(message), message
+
+
+def analyze_log_events(events, burst_window=60, burst_threshold=5, timeline_size=50):
+    """Сводка по событиям лога за один проход с ограниченной памятью
+
+    Всплеск ошибок - не меньше burst_threshold ошибок за burst_window секунд.
+    В хронологии сбоев сохранения хранятся последние timeline_size записей.
+    """
+    counts = {}
+    levels = {}
+    per_day = {}
+    first = last = None
+    window = collections.deque()
+    bursts = collections.deque(maxlen=timeline_size)
+    burst = None
+    save_failures = collections.deque(maxlen=timeline_size)
+    window_size = timedelta(seconds=burst_window)
+
+    for moment, level, event, message in events:
+        first = first or moment
+        last = moment
+        counts[event] = counts.get(event, 0) + 1
+        levels[level] = levels.get(level, 0) + 1
+        day = per_day.setdefault(moment.strftime("%Y-%m-%d"), {})
+        day[event] = day.get(event, 0) + 1
+        if event == "save_error":
+            save_failures.append((moment, message))
+        if level not in ("ERROR", "CRITICAL"):
+            continue
+        window.append(moment)
+        while moment - window[0] > window_size:
+            window.popleft()
+        if len(window) >= burst_threshold:
+            if burst is not None and window[0] <= burst[1] + window_size:
+                burst[1] = moment
+                burst[2] += 1
+            else:
+                burst = [window[0], moment, len(window)]
+                bursts.append(burst)
+
+    hours = (last - first).total_seconds() / 3600 if first else 0
+    return {
+        "first": first,
+        "last": last,
+        "counts": counts,
+        "levels": levels,
+        "rates": {event: count / hours for event, count in counts.items()} if hours else {},
+        "per_day": per_day,
+        "bursts": [tuple(burst) for burst in bursts],
+        "save_failures": list(save_failures),
+    }
+
+
+def format_log_report(report):
+    """Текстовый отчет по результатам analyze_log_events"""
+    if report["first"] is None:
+        return "Записей в логах не найдено."
+    lines = [
+        f"Период: {report['first']} - {report['last']}",
+        "",
+        "Операции (всего, в час):",
+    ]
+    for event, count in sorted(report["counts"].items(), key=lambda item: -item[1]):
+        rate = report["rates"].get(event)
+        lines.append(f"  {event:<18} {count:>8}" + (f" {rate:>10.2f}" if rate is not None else ""))
+    lines.append("")
+    lines.append("Уровни: " + ", ".join(f"{level}={count}" for level, count in sorted(report["levels"].items())))
+    lines.append("")
+    lines.append(f"Всплески ошибок: {len(report['bursts'])}")
+    for start, end, count in report["bursts"]:
+        lines.append(f"  {start} - {end}: {count} ошибок")
+    lines.append("")
+    lines.append(f"Сбои сохранения: {report['counts'].get('save_error', 0)} "
+                 f"(успешных сохранений: {report['counts'].get('save_ok', 0)})")
+    for moment, message in report["save_failures"]:
+        lines.append(f"  {moment}  {message}")
+    return "\n".join(lines)
+
+
+def benchmark_storage(count, rounds=5):
+    """Замер скорости сохранения и загрузки для каждого уровня надежности"""
+    tasks = [
+        {
+            "id": i,
+            "text": f"Задача номер {i}",
+            "completed": i % 3 == 0,
+            "date": "2024-01-01",
+            "priority": PRIORITIES[i % len(PRIORITIES)],
+            "tags": ["работа"] if i % 2 else []
+        }
+        for i in range(1, count + 1)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for durability in DURABILITY_LEVELS:
+            store = SnapshotStore(os.path.join(directory, durability, "tasks.json"), durability=durability)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                store.save(tasks)
+            save_time = (time.perf_counter() - start) / rounds
+            start = time.perf_counter()
+            for _ in range(rounds):
+                store.load()
+            load_time = (time.perf_counter() - start) / rounds
+            print(f"{durability:<8} сохранение: {save_time * 1000:9.1f} мс   загрузка: {load_time * 1000:9.1f} мс   ({count} задач)")
+
+
+def count_widgets(widget):
+    """Число виджетов в дереве, включая сам виджет"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def resident_memory():
+    """Резидентная память процесса в байтах (0, если /proc недоступен)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def soak_test(cycles, warmup=50, keep=50, max_growth=1024 * 1024, max_rss_growth=8 * 1024 * 1024):
+    """Длительный прогон интерфейса с поиском утечек виджетов, таймеров и памяти.
+
+    Каждый цикл добавляет, редактирует, отмечает и удаляет задачи, открывает и
+    закрывает диалог и сворачивает окно в трей. После прогрева число виджетов и
+    отложенных вызовов должно оставаться постоянным, а рост памяти Python
+    (max_growth) и резидентной памяти процесса (max_rss_growth) - ограниченным.
+    Возвращает True, если утечек не найдено.
+    """
+    import tracemalloc
+
+    saved_environ = {name: os.environ.get(name) for name in ("HOME", "USERPROFILE")}
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            # Keep the soak away from the user's real data
+            os.environ["HOME"] = os.environ["USERPROFILE"] = home
+            data_dir = os.path.join(home, "todo_app_data")
+            os.makedirs(data_dir)
+            with open(os.path.join(data_dir, "settings.json"), "w", encoding="utf-8") as f:
+                json.dump({"durability": "fast"}, f)
+
+            root = tk.Tk()
+            app = TodoApp(root)
+
+            def cycle(i):
+                app.task_var.set(f"Задача {i % 200}")
+                app.add_task()
+                if len(app.tasks) > keep:
+                    app.remove_task_tree(app.tasks[0])
+                app.flush_refresh()
+                app.select_task(app.tasks[-1])
+                app.edit_task()
+                edit_window = app.dialogs["edit"]
+                entry, save_button = edit_window.winfo_children()
+                entry.delete(0, tk.END)
+                entry.insert(0, f"Правка {i % 200}")
+                save_button.invoke()
+                app.flush_refresh()
+                app.select_task(app.tasks[len(app.tasks) // 2])
+                app.edit_task()
+                app.close_dialog("edit")
+                app.toggle_task_status(None)
+                app.minimize_window()
+                root.update()
+                app.show_window()
+                root.update()
+
+            def sample():
+                # Let the 10 ms callback of show_window fire, so timing is not counted as a leak
+                root.after(20)
+                root.update()
+                return count_widgets(root), len(root.tk.splitlist(root.tk.call("after", "info")))
+
+            try:
+                for i in range(warmup):
+                    cycle(i)
+                widgets, timers = sample()
+                tracemalloc.start()
+                baseline = tracemalloc.take_snapshot()
+                rss = resident_memory()
+                start = time.perf_counter()
+                for i in range(warmup, warmup + cycles):
+                    cycle(i)
+                elapsed = time.perf_counter() - start
+                end_widgets, end_timers = sample()
+                snapshot = tracemalloc.take_snapshot()
+                growth = sum(stat.size_diff for stat in snapshot.compare_to(baseline, "filename"))
+                tracemalloc.stop()
+                rss_growth = resident_memory() - rss
+            finally:
+                root.destroy()
+                app.logger.removeHandler(app.log_handler)
+                app.log_handler.close()
+    finally:
+        for name, value in saved_environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    print(f"Циклов: {cycles}, {elapsed / cycles * 1000:.1f} мс на цикл")
+    print(f"Виджеты: {widgets} -> {end_widgets}")
+    print(f"Отложенные вызовы: {timers} -> {end_timers}")
+    print(f"Память Python: {growth / 1024:+.1f} КБ, резидентная: {rss_growth / 1024:+.1f} КБ")
+    leaks = []
+    if end_widgets > widgets:
+        leaks.append(f"виджетов стало больше на {end_widgets - widgets}")
+    if end_timers > timers:
+        leaks.append(f"отложенных вызовов стало больше на {end_timers - timers}")
+    if growth > max_growth:
+        leaks.append(f"память Python выросла на {growth / 1024:.1f} КБ")
+        for stat in snapshot.compare_to(baseline, "lineno")[:10]:
+            print(f"  {stat}")
+    # Tk allocations are invisible to tracemalloc; 0 means /proc is unavailable
+    if rss and rss_growth > max_rss_growth:
+        leaks.append(f"резидентная память выросла на {rss_growth / 1024:.1f} КБ")
+    for leak in leaks:
+        print(f"Утечка: {leak}", file=sys.stderr)
+    return not leaks
+
 
 class TodoApp:
     def __init__(self, root):
@@ -19,14 +1513,25 @@ class TodoApp:
             self.data_dir = os.path.join(os.path.expanduser("~"), "todo_app_data")
             os.makedirs(self.data_dir, exist_ok=True)
             
-            # Setup logging first
-            self.setup_logging()
+            # Load settings first: the log format must be known before the first record
+            self.settings, settings_problems = self.load_settings()
+
+            # Setup logging
+            self.setup_logging(self.settings["log_format"])
             self.logger.info("Приложение запущено")
-            
+            for level, message in settings_problems:
+                self.logger.log(level, message)
+
             # Define file paths
             self.tasks_file = os.path.join(self.data_dir, "tasks.json")
-            self.backup_file = os.path.join(self.data_dir, "tasks.json.backup")
-            self.logger.debug(f"Пути к файлам: tasks_file={self.tasks_file}, backup_file={self.backup_file}")
+            self.storage = SnapshotStore(
+                self.tasks_file,
+                generations=self.settings["generations"],
+                durability=self.settings["durability"],
+                logger=self.logger
+            )
+            self.history = VersionHistory(os.path.join(self.data_dir, "history"), logger=self.logger)
+            self.logger.debug(f"Пути к файлам: tasks_file={self.tasks_file}, durability={self.storage.durability}")
 
             # Initialize window properties
             self.root.geometry("300x400")
@@ -41,6 +1546,8 @@ class TodoApp:
             self.is_expanded = False
             self.is_transparent = False
             self.is_minimized = False
+            self.tray = None
+            self.dialogs = {}
             
             # Create title bar first (before setting overrideredirect)
             self.create_title_bar()
@@ -55,7 +1562,26 @@ class TodoApp:
             
             # Load tasks
             self.tasks = []
+            self.next_id = 1
+            self.index = TaskIndex()
+            self.item_to_task = {}
+            self.sort_column = "Status"
+            self.sort_reverse = False
+            self.drag_item = None
+            self.rebalance_pending = False
+            self.expanded = set()
+            self.similar_search = None
+            self.refresh_pending = False
+            self.render_counters = {"requested": 0, "coalesced": 0, "rendered": 0}
             self.load_tasks()
+            self.prepare_tasks()
+            self.activity = TaskActivity(os.path.join(self.data_dir, "stats.json"), logger=self.logger)
+            self.activity.load(self.tasks)
+
+            # Load autocomplete history
+            self.history_file = os.path.join(self.data_dir, "task_history.txt")
+            self.completions = CompletionIndex()
+            self.load_history()
             
             # Create main interface
             self.create_main_interface()
@@ -65,6 +1591,10 @@ class TodoApp:
             
             # Bind global hotkey for showing window
             self.root.bind_all('<Alt-s>', self.show_window)
+
+            # Record the loaded list and drop expired versions once the window is up
+            self.root.after_idle(self.record_history)
+            self.root.after_idle(self.prune_history)
             
         except Exception as e:
             self.show_error_and_exit("Ошибка при инициализации приложения", e)
@@ -92,6 +1622,24 @@ class TodoApp:
         )
         self.expand_button.pack(side=tk.RIGHT)
         
+        # Кнопка истории версий
+        self.history_button = ttk.Button(
+            self.title_bar,
+            text="⟲",
+            width=3,
+            command=self.show_history
+        )
+        self.history_button.pack(side=tk.RIGHT)
+        
+        # Кнопка статистики
+        self.stats_button = ttk.Button(
+            self.title_bar,
+            text="Σ",
+            width=3,
+            command=self.show_stats
+        )
+        self.stats_button.pack(side=tk.RIGHT)
+        
         # Кнопка настройки прозрачности
         self.opacity_button = ttk.Button(
             self.title_bar,
@@ -121,6 +1669,15 @@ class TodoApp:
         )
         self.task_entry.pack(side=tk.LEFT, padx=(0, 5), fill=tk.X, expand=True)
         self.task_entry.bind("<Return>", lambda e: self.add_task())
+        self.task_entry.bind("<KeyRelease>", self.update_suggestions)
+        self.task_entry.bind("<Down>", self.focus_suggestions)
+        self.task_entry.bind("<Escape>", lambda e: self.hide_suggestions())
+
+        # Autocomplete suggestions, placed under the entry while typing
+        self.suggestion_list = tk.Listbox(self.root, height=5, activestyle="dotbox")
+        self.suggestion_list.bind("<Return>", self.accept_suggestion)
+        self.suggestion_list.bind("<Double-Button-1>", self.accept_suggestion)
+        self.suggestion_list.bind("<Escape>", lambda e: self.hide_suggestions())
 
         # Add button
         self.add_button = ttk.Button(
@@ -131,6 +1688,32 @@ class TodoApp:
         )
         self.add_button.pack(side=tk.LEFT)
 
+        # View controls: grouping and tag filter
+        self.view_frame = ttk.Frame(self.root, padding=(10, 0))
+        self.view_frame.pack(fill=tk.X)
+
+        self.group_var = tk.StringVar(value=GROUP_NONE)
+        self.group_combo = ttk.Combobox(
+            self.view_frame,
+            textvariable=self.group_var,
+            values=(GROUP_NONE, GROUP_PRIORITY, GROUP_TAGS),
+            state="readonly",
+            width=16
+        )
+        self.group_combo.pack(side=tk.LEFT, padx=(0, 5))
+        self.group_combo.bind("<<ComboboxSelected>>", lambda e: self.schedule_refresh())
+
+        self.filter_var = tk.StringVar(value=ALL_TAGS)
+        self.filter_combo = ttk.Combobox(
+            self.view_frame,
+            textvariable=self.filter_var,
+            values=(ALL_TAGS,),
+            state="readonly",
+            width=12
+        )
+        self.filter_combo.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.filter_combo.bind("<<ComboboxSelected>>", lambda e: self.schedule_refresh())
+
         # Create task list
         self.task_frame = ttk.Frame(self.root, padding="10")
         self.task_frame.pack(fill=tk.BOTH, expand=True)
@@ -138,19 +1721,24 @@ class TodoApp:
         # Create treeview
         self.tree = ttk.Treeview(
             self.task_frame,
-            columns=("Status", "Task", "Date"),
-            show="headings",
+            columns=("Order", "Status", "Priority", "Task", "Tags", "Date"),
+            show="tree headings",
             height=10
         )
 
-        # Configure columns
-        self.tree.heading("Status", text="Статус")
-        self.tree.heading("Task", text="Задача")
-        self.tree.heading("Date", text="Дата")
-        
+        # Configure columns (click on a heading sorts by that column)
+        for column, title in COLUMN_TITLES.items():
+            self.tree.heading(column, text=title, command=lambda c=column: self.sort_by_column(c))
+        self.update_sort_headings()
+
+        self.tree.column("#0", width=30, stretch=False)
+        self.tree.column("Order", width=20, anchor=tk.CENTER)
         self.tree.column("Status", width=50, anchor=tk.CENTER)
+        self.tree.column("Priority", width=40, anchor=tk.CENTER)
         self.tree.column("Task", width=400, anchor=tk.W)
+        self.tree.column("Tags", width=100, anchor=tk.W)
         self.tree.column("Date", width=100, anchor=tk.CENTER)
+        self.tree.tag_configure("group", background="#e8e8e8")
 
         # Add scrollbar
         scrollbar = ttk.Scrollbar(self.task_frame, orient=tk.VERTICAL, command=self.tree.yview)
@@ -162,11 +1750,36 @@ class TodoApp:
 
         # Bind events
         self.tree.bind("<Double-1>", self.toggle_task_status)
+        self.tree.bind("<ButtonPress-1>", self.start_drag)
+        self.tree.bind("<B1-Motion>", self.drag_motion)
+        self.tree.bind("<ButtonRelease-1>", self.finish_drag)
         self.tree.bind("<Button-3>", self.show_context_menu)
+        self.tree.bind("<<TreeviewOpen>>", self.expand_task)
+        self.tree.bind("<<TreeviewClose>>", self.collapse_task)
 
         # Create context menu
         self.context_menu = tk.Menu(self.root, tearoff=0)
         self.context_menu.add_command(label="Редактировать", command=self.edit_task)
+        self.context_menu.add_command(label="Добавить подзадачу...", command=self.add_subtask)
+        self.priority_menu = tk.Menu(self.context_menu, tearoff=0)
+        for priority in PRIORITIES:
+            self.priority_menu.add_command(
+                label=PRIORITY_LABELS[priority],
+                command=lambda p=priority: self.set_task_priority(p)
+            )
+        self.context_menu.add_cascade(label="Приоритет", menu=self.priority_menu)
+        self.context_menu.add_command(label="Теги...", command=self.edit_task_tags)
+        self.recurrence_menu = tk.Menu(self.context_menu, tearoff=0)
+        self.recurrence_menu.add_command(label="Не повторять", command=lambda: self.set_task_recurrence(None))
+        for freq in RECURRENCE_FREQUENCIES:
+            self.recurrence_menu.add_command(
+                label=RECURRENCE_LABELS[freq],
+                command=lambda f=freq: self.set_task_recurrence(f)
+            )
+        self.recurrence_menu.add_command(label="Правило RRULE...", command=self.edit_task_recurrence)
+        self.context_menu.add_cascade(label="Повторение", menu=self.recurrence_menu)
+        self.context_menu.add_command(label="Найти похожие задачи", command=self.find_similar_tasks)
+        self.context_menu.add_command(label="Экспорт...", command=self.export_view)
         self.context_menu.add_command(label="Удалить", command=self.delete_task)
 
         # Delete button
@@ -189,13 +1802,16 @@ class TodoApp:
             print(error_text, file=sys.stderr)
         sys.exit(1)
 
-    def setup_logging(self):
+    def setup_logging(self, log_format="text"):
         """Настройка системы логирования"""
         self.logger = logging.getLogger('todo_app')
         self.logger.setLevel(logging.DEBUG)
 
         # Создаем форматтер для логов
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        if log_format == "json":
+            formatter = JsonLogFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
         # Настраиваем файловый обработчик с ротацией (максимум 5 файлов по 1MB)
         log_file = os.path.join(self.data_dir, 'todo_app.log')
@@ -203,6 +1819,223 @@ class TodoApp:
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
         self.logger.addHandler(file_handler)
+        self.log_handler = file_handler
+
+    def new_task(self, text):
+        """Создание новой задачи с уникальным идентификатором"""
+        task = {
+            "id": self.next_id,
+            "text": text,
+            "completed": False,
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "priority": "normal",
+            "tags": [],
+            "rank": rank_after(self.index.last_rank()),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.next_id += 1
+        # Every ~60 appends make the key one digit longer
+        self.schedule_rebalance(task["rank"])
+        return task
+
+    def prepare_tasks(self):
+        """Дополнение загруженных задач новыми полями и построение индексов"""
+        ids = [task["id"] for task in self.tasks if isinstance(task.get("id"), int)]
+        self.next_id = max(ids, default=0) + 1
+        seen = set()
+        for task in self.tasks:
+            task.setdefault("completed", False)
+            task.setdefault("date", datetime.now().strftime("%Y-%m-%d"))
+            if not isinstance(task.get("created_at"), str):
+                # Older files: the date was the creation date unless it lies ahead
+                task["created_at"] = min(str(task["date"]), datetime.now().strftime("%Y-%m-%d")) + " 00:00:00"
+            if task.get("priority") not in PRIORITIES:
+                task["priority"] = "normal"
+            if not isinstance(task.get("tags"), list):
+                task["tags"] = []
+            if "recurrence" in task and not isinstance(task["recurrence"], str):
+                del task["recurrence"]
+            if not isinstance(task.get("id"), int) or task["id"] in seen:
+                task["id"] = self.next_id
+                self.next_id += 1
+            seen.add(task["id"])
+        for task in self.tasks:
+            if "parent" in task and (task["parent"] not in seen or task["parent"] == task["id"]):
+                del task["parent"]
+        by_id = {task["id"]: task for task in self.tasks}
+        acyclic = set()
+        for task in self.tasks:
+            chain = set()
+            current = task
+            while current["id"] not in acyclic:
+                chain.add(current["id"])
+                parent_id = current.get("parent")
+                if parent_id is None:
+                    break
+                if parent_id in chain:
+                    # No task on a parent cycle is a root, so the whole cycle would vanish
+                    self.logger.warning(f"Разорван цикл подзадач на задаче '{current['text']}'")
+                    del current["parent"]
+                    break
+                current = by_id[parent_id]
+            acyclic |= chain
+        ranks = [task.get("rank") for task in self.tasks]
+        if (not all(self.is_valid_rank(rank) for rank in ranks) or len(set(ranks)) != len(ranks)
+                or any(len(rank) > RANK_REBALANCE_LENGTH for rank in ranks)):
+            # Older files have no manual order or overgrown keys: keep valid keys' order, append the rest
+            self.assign_ranks(sorted(
+                self.tasks,
+                key=lambda t: (0, t["rank"]) if self.is_valid_rank(t.get("rank")) else (1, "")
+            ))
+        self.index.rebuild(self.tasks)
+
+    @staticmethod
+    def is_valid_rank(rank):
+        return (isinstance(rank, str) and rank and not rank.endswith("0")
+                and all(c in RANK_DIGITS for c in rank))
+
+    def assign_ranks(self, ordered_tasks):
+        """Равномерное перераспределение ключей ручного порядка"""
+        for task, rank in zip(ordered_tasks, rank_sequence(len(ordered_tasks))):
+            task["rank"] = rank
+
+    def load_history(self):
+        """Загрузка истории текстов задач для автодополнения"""
+        try:
+            if os.path.exists(self.history_file):
+                with open(self.history_file, "r", encoding="utf-8") as f:
+                    self.completions.rebuild(line.rstrip("\n") for line in f if line.strip())
+            else:
+                # First run: seed the history with the current tasks
+                texts = [task["text"] for task in self.tasks]
+                self.completions.rebuild(texts)
+                with open(self.history_file, "w", encoding="utf-8") as f:
+                    f.writelines(text.replace("\n", " ") + "\n" for text in texts)
+            self.logger.debug(f"Загружено {len(self.completions.keys)} вариантов автодополнения")
+        except Exception as e:
+            self.logger.error(f"Ошибка при загрузке истории задач: {str(e)}")
+
+    def remember_task_text(self, text):
+        """Учет текста в автодополнении и дозапись в файл истории"""
+        self.completions.add(text)
+        try:
+            with open(self.history_file, "a", encoding="utf-8") as f:
+                f.write(text.replace("\n", " ") + "\n")
+        except Exception as e:
+            self.logger.error(f"Ошибка при записи истории задач: {str(e)}")
+
+    def update_suggestions(self, event):
+        """Обновление списка подсказок после нажатия клавиши"""
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        text = self.task_var.get()
+        suggestions = [suggestion for suggestion in self.completions.suggest(text) if suggestion != text.strip()]
+        if not suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_list.delete(0, tk.END)
+        self.suggestion_list.insert(tk.END, *suggestions)
+        self.suggestion_list.configure(height=len(suggestions))
+        self.suggestion_list.place(in_=self.task_entry, x=0, rely=1.0, relwidth=1.0)
+        self.suggestion_list.lift()
+
+    def focus_suggestions(self, event):
+        """Переход к списку подсказок по стрелке вниз"""
+        if self.suggestion_list.winfo_ismapped():
+            self.suggestion_list.focus_set()
+            self.suggestion_list.selection_clear(0, tk.END)
+            self.suggestion_list.selection_set(0)
+            self.suggestion_list.activate(0)
+            return "break"
+
+    def accept_suggestion(self, event):
+        """Подстановка выбранной подсказки в поле ввода"""
+        selection = self.suggestion_list.curselection()
+        if selection:
+            self.task_var.set(self.suggestion_list.get(selection[0]))
+            self.task_entry.icursor(tk.END)
+        self.hide_suggestions()
+        return "break"
+
+    def hide_suggestions(self):
+        self.suggestion_list.place_forget()
+        self.task_entry.focus_set()
+
+    def select_task(self, task):
+        """Выделение строки задачи, если она видна в списке"""
+        for item, shown_task in self.item_to_task.items():
+            if shown_task is task:
+                self.tree.selection_set(item)
+                self.tree.see(item)
+                break
+
+    def find_similar_tasks(self):
+        """Фоновый поиск похожих задач, чтобы не замедлять ввод"""
+        if self.similar_search is not None:
+            return
+        items = [(task["id"], task["text"]) for task in self.tasks]
+        result = {"pairs": [], "error": None}
+
+        def search():
+            # An exception would otherwise die with the thread and read as "nothing found"
+            try:
+                result["pairs"] = find_near_duplicates(items)
+            except Exception as e:
+                result["error"] = (e, traceback.format_exc())
+
+        thread = threading.Thread(target=search, daemon=True)
+        self.similar_search = (thread, result)
+        self.logger.info(f"Запущен поиск похожих задач среди {len(items)} задач")
+        thread.start()
+        self.root.after(100, self.poll_similar_tasks)
+
+    def poll_similar_tasks(self):
+        thread, result = self.similar_search
+        if thread.is_alive():
+            self.root.after(100, self.poll_similar_tasks)
+            return
+        self.similar_search = None
+        if result["error"] is not None:
+            error, details = result["error"]
+            self.logger.error(f"Ошибка при поиске похожих задач: {str(error)}\n{details}")
+            messagebox.showerror("Ошибка", f"Не удалось найти похожие задачи: {str(error)}")
+            return
+        # Tasks may have been deleted while the search was running
+        pairs = [(similarity, self.index.by_id[first], self.index.by_id[second])
+                 for similarity, first, second in result["pairs"]
+                 if first in self.index.by_id and second in self.index.by_id]
+        self.logger.info(f"Найдено пар похожих задач: {len(pairs)}")
+        if not pairs:
+            messagebox.showinfo("Похожие задачи", "Похожих задач не найдено.")
+            return
+        window = self.open_dialog("similar", "Похожие задачи", "400x250")
+        listbox = tk.Listbox(window)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for similarity, first, second in pairs:
+            listbox.insert(tk.END, f"{similarity:.0%}: '{first['text']}' ≈ '{second['text']}'")
+        ttk.Button(window, text="Закрыть", command=lambda: self.close_dialog("similar")).pack(pady=5)
+
+    def open_dialog(self, name, title, geometry):
+        """Окно диалога в единственном экземпляре: прежнее окно того же вида закрывается"""
+        self.close_dialog(name)
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        window.geometry(geometry)
+        window.protocol("WM_DELETE_WINDOW", lambda: self.close_dialog(name))
+        self.dialogs[name] = window
+        return window
+
+    def close_dialog(self, name):
+        window = self.dialogs.pop(name, None)
+        if window is not None and window.winfo_exists():
+            window.destroy()
+
+    def get_selected_task(self):
+        """Задача, соответствующая выбранной строке списка"""
+        selected_item = self.tree.selection()
+        if selected_item:
+            return self.item_to_task.get(selected_item[0])
+        return None
 
     def add_task(self):
         task_text = self.task_var.get().strip()
@@ -211,72 +2044,139 @@ class TodoApp:
                 self.logger.warning(f"Попытка добавить слишком длинную задачу: {len(task_text)} символов")
                 messagebox.showwarning("Предупреждение", "Задача слишком длинная! Максимум 100 символов.")
                 return
-            current_time = datetime.now().strftime("%Y-%m-%d")
-            self.tasks.append({
-                "text": task_text,
-                "completed": False,
-                "date": current_time
-            })
+            duplicates = self.index.find_duplicates(task_text)
+            if duplicates and not messagebox.askyesno(
+                    "Дубликат",
+                    f"Задача '{duplicates[0]['text']}' уже есть в списке. Все равно добавить новую?"):
+                # Merge into the existing task instead of adding a copy
+                self.logger.info(f"Повторная задача не добавлена: {task_text}")
+                self.task_var.set("")
+                self.hide_suggestions()
+                self.select_task(duplicates[0])
+                return
+            task = self.new_task(task_text)
+            self.tasks.append(task)
+            self.index.add(task)
+            self.activity.task_added(task)
             self.task_var.set("")
             self.logger.info(f"Добавлена новая задача: {task_text}")
+            self.hide_suggestions()
+            self.remember_task_text(task_text)
             self.save_tasks()
-            self.refresh_task_list()
+            self.schedule_refresh()
         else:
             self.logger.warning("Попытка добавить пустую задачу")
             messagebox.showwarning("Предупреждение", "Задача не может быть пустой!")
 
     def toggle_task_status(self, event):
-        selected_item = self.tree.selection()
-        if selected_item:
-            item = selected_item[0]
-            index = self.tree.index(item)
-            task = self.tasks[index]
+        task = self.get_selected_task()
+        if task:
             task["completed"] = not task["completed"]
+            if task["completed"]:
+                task["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.activity.task_completed(task)
+            else:
+                self.activity.task_completed(task, -1)
+                task.pop("completed_at", None)
+            self.index.reindex(task)
             status = "выполнена" if task["completed"] else "не выполнена"
             self.logger.info(f"Изменен статус задачи '{task['text']}': {status}")
+            if task["completed"] and task.get("recurrence"):
+                self.create_next_occurrence(task)
             self.save_tasks()
-            self.refresh_task_list()
+            self.schedule_refresh()
+            # Keep the Treeview class binding from also expanding or collapsing the row
+            return "break"
 
     def delete_task(self):
-        selected_item = self.tree.selection()
-        if selected_item:
-            if messagebox.askyesno("Подтверждение", "Вы уверены, что хотите удалить выбранную задачу?"):
-                item = selected_item[0]
-                index = self.tree.index(item)
-                deleted_task = self.tasks[index]
-                del self.tasks[index]
-                self.logger.info(f"Удалена задача: {deleted_task['text']}")
-                self.save_tasks()
-                self.refresh_task_list()
+        deleted_task = self.get_selected_task()
+        if deleted_task:
+            deleted_ids = [deleted_task["id"], *self.index.descendants(deleted_task["id"])]
+            question = "Вы уверены, что хотите удалить выбранную задачу?"
+            if len(deleted_ids) > 1:
+                question = f"Вы уверены, что хотите удалить выбранную задачу и ее подзадачи ({len(deleted_ids) - 1})?"
+            if messagebox.askyesno("Подтверждение", question):
+                self.remove_task_tree(deleted_task)
+
+    def remove_task_tree(self, deleted_task):
+        """Удаление задачи вместе со всеми подзадачами"""
+        deleted_ids = [deleted_task["id"], *self.index.descendants(deleted_task["id"])]
+        # Children first, so parent roll-up counters stay consistent
+        for task_id in reversed(deleted_ids):
+            self.index.remove(task_id)
+            self.expanded.discard(task_id)
+        deleted = set(deleted_ids)
+        self.tasks[:] = [task for task in self.tasks if task["id"] not in deleted]
+        self.logger.info(f"Удалена задача: {deleted_task['text']} (подзадач: {len(deleted_ids) - 1})")
+        self.save_tasks()
+        self.schedule_refresh()
+
+    def add_subtask(self):
+        """Добавление подзадачи к выбранной задаче"""
+        parent = self.get_selected_task()
+        if parent:
+            task_text = simpledialog.askstring("Подзадача", f"Подзадача для '{parent['text']}':", parent=self.root)
+            if task_text is None:
+                return
+            task_text = task_text.strip()
+            if not task_text:
+                self.logger.warning("Попытка добавить пустую подзадачу")
+                messagebox.showwarning("Предупреждение", "Задача не может быть пустой!")
+                return
+            if len(task_text) > 100:
+                self.logger.warning(f"Попытка добавить слишком длинную подзадачу: {len(task_text)} символов")
+                messagebox.showwarning("Предупреждение", "Задача слишком длинная! Максимум 100 символов.")
+                return
+            task = self.new_task(task_text)
+            task["parent"] = parent["id"]
+            self.tasks.append(task)
+            self.index.add(task)
+            self.activity.task_added(task)
+            self.expanded.add(parent["id"])
+            self.logger.info(f"Добавлена подзадача к '{parent['text']}': {task_text}")
+            self.remember_task_text(task_text)
+            self.save_tasks()
+            self.schedule_refresh()
 
     def edit_task(self):
-        selected_item = self.tree.selection()
-        if selected_item:
-            item = selected_item[0]
-            index = self.tree.index(item)
-            old_text = self.tasks[index]["text"]
+        task = self.get_selected_task()
+        if task:
+            old_text = task["text"]
             
             # Create edit window
-            edit_window = tk.Toplevel(self.root)
-            edit_window.title("Редактировать задачу")
-            edit_window.geometry("400x100")
+            edit_window = self.open_dialog("edit", "Редактировать задачу", "400x100")
             
             edit_var = tk.StringVar(value=old_text)
             edit_entry = ttk.Entry(edit_window, textvariable=edit_var, width=40)
             edit_entry.pack(pady=10)
             
             def save_edit():
+                if self.index.by_id.get(task["id"]) is not task:
+                    # The dialog is not modal: the task may be gone or replaced by a restore
+                    self.logger.warning(f"Редактирование отменено, задача '{old_text}' больше не в списке")
+                    messagebox.showwarning("Предупреждение", "Задача уже удалена из списка.", parent=edit_window)
+                    self.close_dialog("edit")
+                    return
                 new_text = edit_var.get().strip()
                 if new_text:
                     if len(new_text) > 100:
                         self.logger.warning(f"Попытка сохранить слишком длинную задачу при редактировании: {len(new_text)} символов")
                         messagebox.showwarning("Предупреждение", "Задача слишком длинная! Максимум 100 символов.")
                         return
-                    self.tasks[index]["text"] = new_text
+                    duplicates = self.index.find_duplicates(new_text, exclude_id=task["id"])
+                    if duplicates and not messagebox.askyesno(
+                            "Дубликат",
+                            f"Задача '{duplicates[0]['text']}' уже есть в списке. Все равно сохранить?",
+                            parent=edit_window):
+                        self.logger.info(f"Редактирование отменено, текст совпадает с другой задачей: {new_text}")
+                        return
+                    task["text"] = new_text
+                    self.index.reindex(task)
                     self.logger.info(f"Задача отредактирована: '{old_text}' -> '{new_text}'")
+                    self.remember_task_text(new_text)
                     self.save_tasks()
-                    self.refresh_task_list()
-                    edit_window.destroy()
+                    self.schedule_refresh()
+                    self.close_dialog("edit")
                 else:
                     self.logger.warning("Попытка сохранить пустую задачу при редактировании")
                     messagebox.showwarning("Предупреждение", "Задача не может быть пустой!")
@@ -284,46 +2184,475 @@ class TodoApp:
             save_button = ttk.Button(edit_window, text="Сохранить", command=save_edit)
             save_button.pack(pady=5)
 
+    def set_task_priority(self, priority):
+        """Изменение приоритета выбранной задачи"""
+        task = self.get_selected_task()
+        if task and task["priority"] != priority:
+            task["priority"] = priority
+            self.index.reindex(task)
+            self.logger.info(f"Изменен приоритет задачи '{task['text']}': {PRIORITY_LABELS[priority]}")
+            self.save_tasks()
+            self.schedule_refresh()
+
+    def edit_task_tags(self):
+        """Изменение тегов выбранной задачи"""
+        task = self.get_selected_task()
+        if task:
+            text = simpledialog.askstring(
+                "Теги",
+                "Введите теги через запятую или пробел:",
+                initialvalue=", ".join(task["tags"]),
+                parent=self.root
+            )
+            if text is None:
+                return
+            tags = parse_tags(text)
+            if tags != task["tags"]:
+                task["tags"] = tags
+                self.index.reindex(task)
+                self.logger.info(f"Изменены теги задачи '{task['text']}': {tags}")
+                self.save_tasks()
+                self.schedule_refresh()
+
+    def create_next_occurrence(self, task):
+        """Создание следующего экземпляра повторяющейся задачи
+
+        Правило переходит к новому экземпляру, поэтому в списке всегда
+        есть не больше одного незавершенного экземпляра серии.
+        """
+        try:
+            rule = RecurrenceRule.parse(task.pop("recurrence"))
+        except ValueError as e:
+            self.logger.error(f"Некорректное правило повторения задачи '{task['text']}': {str(e)}")
+            return None
+        current = datetime.strptime(task["date"], "%Y-%m-%d").date()
+        following = rule.advance(current, date.today())
+        if following is None:
+            self.logger.info(f"Серия повторений задачи '{task['text']}' завершена")
+            return None
+        next_date, next_rule = following
+        next_task = self.new_task(task["text"])
+        next_task["date"] = next_date.strftime("%Y-%m-%d")
+        next_task["priority"] = task["priority"]
+        next_task["tags"] = list(task["tags"])
+        next_task["recurrence"] = str(next_rule)
+        if "parent" in task:
+            next_task["parent"] = task["parent"]
+        self.tasks.append(next_task)
+        self.index.add(next_task)
+        self.activity.task_added(next_task)
+        self.logger.info(f"Создан следующий экземпляр задачи '{task['text']}' на {next_task['date']}")
+        return next_task
+
+    def set_task_recurrence(self, freq):
+        """Установка предопределенного правила повторения"""
+        task = self.get_selected_task()
+        if task:
+            if freq is None:
+                self.apply_task_recurrence(task, None)
+            elif freq == "MONTHLY":
+                day = datetime.strptime(task["date"], "%Y-%m-%d").day
+                self.apply_task_recurrence(task, RecurrenceRule(freq, bymonthday=day))
+            else:
+                self.apply_task_recurrence(task, RecurrenceRule(freq))
+
+    def edit_task_recurrence(self):
+        """Ввод произвольного правила повторения в формате RRULE"""
+        task = self.get_selected_task()
+        if task:
+            text = simpledialog.askstring(
+                "Повторение",
+                "Правило RRULE (например, FREQ=WEEKLY;BYDAY=MO,FR):",
+                initialvalue=task.get("recurrence", ""),
+                parent=self.root
+            )
+            if text is None:
+                return
+            if not text.strip():
+                self.apply_task_recurrence(task, None)
+                return
+            try:
+                rule = RecurrenceRule.parse(text)
+            except ValueError as e:
+                self.logger.warning(f"Некорректное правило повторения: {text}: {str(e)}")
+                messagebox.showwarning("Предупреждение", f"Некорректное правило повторения:\n{str(e)}")
+                return
+            self.apply_task_recurrence(task, rule)
+
+    def apply_task_recurrence(self, task, rule):
+        if rule is None:
+            task.pop("recurrence", None)
+        else:
+            task["recurrence"] = str(rule)
+        self.logger.info(f"Изменено повторение задачи '{task['text']}': {task.get('recurrence', 'нет')}")
+        self.save_tasks()
+        self.schedule_refresh()
+
+    def can_reorder(self):
+        """Перетаскивание доступно только в ручном порядке без группировки"""
+        return self.sort_column == "Order" and not self.sort_reverse and self.group_var.get() == GROUP_NONE
+
+    def start_drag(self, event):
+        """Начало перетаскивания задачи"""
+        item = self.tree.identify_row(event.y)
+        self.drag_item = item if item in self.item_to_task else None
+
+    def drag_motion(self, event):
+        """Перемещение строки вслед за курсором"""
+        if self.drag_item and self.can_reorder():
+            target = self.tree.identify_row(event.y)
+            parent_item = self.tree.parent(self.drag_item)
+            if target and target != self.drag_item and self.tree.parent(target) == parent_item:
+                self.tree.move(self.drag_item, parent_item, self.tree.index(target))
+
+    def finish_drag(self, event):
+        """Сохранение нового положения: меняется только ключ перемещенной задачи"""
+        item, self.drag_item = self.drag_item, None
+        if not item or not self.can_reorder() or not self.tree.exists(item):
+            return
+        task = self.item_to_task[item]
+        previous_item, next_item = self.tree.prev(item), self.tree.next(item)
+        lower = self.item_to_task[previous_item]["rank"] if previous_item else ""
+        upper = self.item_to_task[next_item]["rank"] if next_item else None
+        if lower < task["rank"] and (upper is None or task["rank"] < upper):
+            return
+        if upper is not None and lower >= upper:
+            self.rebalance_ranks()
+            return
+        task["rank"] = rank_between(lower, upper)
+        self.index.reindex(task)
+        self.logger.info(f"Задача '{task['text']}' перемещена, новый ключ порядка: {task['rank']}")
+        self.save_tasks()
+        self.schedule_rebalance(task["rank"])
+
+    def schedule_rebalance(self, rank):
+        """Отложенное перераспределение ключей, если ключ rank стал слишком длинным"""
+        if len(rank) > RANK_REBALANCE_LENGTH and not self.rebalance_pending:
+            self.rebalance_pending = True
+            self.root.after_idle(self.rebalance_ranks)
+
+    def rebalance_ranks(self):
+        """Перераспределение ключей порядка, когда они стали слишком длинными"""
+        self.rebalance_pending = False
+        self.assign_ranks(self.index.ordered("Order"))
+        self.index.rebuild(self.tasks)
+        self.logger.info(f"Ключи ручного порядка перераспределены для {len(self.tasks)} задач")
+        self.save_tasks()
+        self.schedule_refresh()
+
+    def sort_by_column(self, column):
+        """Сортировка по колонке; повторный клик меняет направление"""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.update_sort_headings()
+        self.schedule_refresh()
+
+    def update_sort_headings(self):
+        """Отображение направления сортировки в заголовках колонок"""
+        for column, title in COLUMN_TITLES.items():
+            if column == self.sort_column:
+                title += " ▼" if self.sort_reverse else " ▲"
+            self.tree.heading(column, text=title)
+
     def show_context_menu(self, event):
-        if self.tree.selection():
+        if self.get_selected_task():
             self.context_menu.post(event.x_root, event.y_root)
 
+    def is_tree_view(self):
+        """Иерархия подзадач показывается без группировки и фильтра"""
+        return self.group_var.get() == GROUP_NONE and self.filter_var.get() == ALL_TAGS
+
+    def view_tasks(self, flat=False):
+        """Задачи текущего представления: фильтр по тегу и порядок сортировки
+
+        В древовидном представлении возвращаются только задачи верхнего уровня,
+        подзадачи подгружаются при раскрытии узла.
+        """
+        # Tag filter and sort order come straight from the indexes
+        visible = self.visible_ids()
+        if not flat and self.is_tree_view():
+            visible = self.index.roots
+        return self.index.ordered(self.sort_column, self.sort_reverse, visible)
+
+    def visible_ids(self):
+        """Идентификаторы задач, прошедших фильтр по тегу (None - все задачи)"""
+        tag_filter = self.filter_var.get()
+        if tag_filter != ALL_TAGS and tag_filter not in self.index.by_tag:
+            tag_filter = ALL_TAGS
+            self.filter_var.set(ALL_TAGS)
+        return None if tag_filter == ALL_TAGS else self.index.by_tag[tag_filter]
+
+    def export_view(self):
+        """Экспорт задач текущего представления в CSV, Markdown или iCalendar"""
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="Экспорт задач",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Markdown", "*.md"), ("iCalendar", "*.ics")]
+        )
+        if not path:
+            return
+        try:
+            count = export_tasks(self.view_tasks(flat=True), path)
+            self.logger.info(f"Экспортировано {count} задач в {path}")
+            messagebox.showinfo("Экспорт", f"Экспортировано задач: {count}")
+        except Exception as e:
+            self.logger.error(f"Ошибка при экспорте задач в {path}: {str(e)}")
+            messagebox.showerror("Ошибка", f"Не удалось экспортировать задачи: {str(e)}")
+
+    def schedule_refresh(self):
+        """Отложенная перерисовка списка
+
+        Все изменения модели до ближайшего простоя цикла событий
+        отображаются за одну перерисовку.
+        """
+        self.render_counters["requested"] += 1
+        if self.refresh_pending:
+            self.render_counters["coalesced"] += 1
+        else:
+            self.refresh_pending = True
+            self.root.after_idle(self.flush_refresh)
+
+    def flush_refresh(self):
+        if self.refresh_pending:
+            self.refresh_task_list()
+            counters = self.render_counters
+            self.logger.debug(
+                f"Перерисовка списка: запросов {counters['requested']}, "
+                f"объединено {counters['coalesced']}, перерисовок {counters['rendered']}"
+            )
+
     def refresh_task_list(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Sort tasks by date and completion status
-        sorted_tasks = sorted(self.tasks, key=lambda x: (x["completed"], x["date"]))
-        
-        for task in sorted_tasks:
-            status = "✓" if task["completed"] else "○"
-            self.tree.insert("", tk.END, values=(status, task["text"], task["date"]))
+        self.refresh_pending = False
+        self.render_counters["rendered"] += 1
+        self.tree.delete(*self.tree.get_children())
+        self.item_to_task = {}
+
+        tags = self.index.tags()
+        self.filter_combo["values"] = [ALL_TAGS] + tags
+
+        group = self.group_var.get()
+        if group == GROUP_NONE:
+            groups = {None: self.view_tasks()}
+            labels = None
+        else:
+            # Each group is one priority or tag bucket of the index, ordered by the sort index
+            if group == GROUP_PRIORITY:
+                buckets = self.index.by_priority
+                labels = PRIORITY_LABELS
+            else:
+                buckets = {tag: self.index.by_tag[tag] for tag in tags}
+                buckets[None] = self.index.untagged
+                labels = {tag: f"#{tag}" for tag in tags}
+                labels[None] = "Без тегов"
+            visible = self.visible_ids()
+            groups = {}
+            for key, ids in buckets.items():
+                if visible is not None:
+                    ids = ids & visible
+                groups[key] = self.index.ordered(self.sort_column, self.sort_reverse, ids) if ids else []
+
+        for key, group_tasks in groups.items():
+            if labels is not None:
+                if not group_tasks:
+                    continue
+                self.tree.insert("", tk.END, values=("", "", "", f"{labels[key]} ({len(group_tasks)})", "", ""), tags=("group",))
+            for task in group_tasks:
+                self.insert_task_row("", task, hierarchical=labels is None and self.is_tree_view())
+
+    def insert_task_row(self, parent_item, task, hierarchical=False):
+        """Вставка строки задачи; подзадачи вставляются только при раскрытии"""
+        status = "✓" if task["completed"] else "○"
+        text = f"↻ {task['text']}" if task.get("recurrence") else task["text"]
+        done, total = self.index.progress(task["id"])
+        if total:
+            text += f" ({done}/{total})"
+        item = self.tree.insert(parent_item, tk.END, values=(
+            "≡",
+            status,
+            PRIORITY_MARKS[task["priority"]],
+            text,
+            ", ".join(task["tags"]),
+            task["date"]
+        ))
+        self.item_to_task[item] = task
+        if hierarchical and total:
+            if task["id"] in self.expanded:
+                self.insert_children(item, task)
+                self.tree.item(item, open=True)
+            else:
+                # Placeholder child makes the node expandable
+                self.tree.insert(item, tk.END)
+        return item
+
+    def insert_children(self, item, task):
+        for child in self.index.ordered(self.sort_column, self.sort_reverse, self.index.children.get(task["id"], set())):
+            self.insert_task_row(item, child, hierarchical=True)
+
+    def forget_children(self, item):
+        """Удаление строк подзадач из дерева"""
+        for child_item in self.tree.get_children(item):
+            self.forget_children(child_item)
+            self.item_to_task.pop(child_item, None)
+        self.tree.delete(*self.tree.get_children(item))
+
+    def expand_task(self, event):
+        """Подгрузка подзадач при раскрытии узла"""
+        item = self.tree.focus()
+        task = self.item_to_task.get(item)
+        if task and task["id"] not in self.expanded:
+            self.expanded.add(task["id"])
+            self.forget_children(item)
+            self.insert_children(item, task)
+
+    def collapse_task(self, event):
+        """Освобождение строк подзадач при сворачивании узла"""
+        item = self.tree.focus()
+        task = self.item_to_task.get(item)
+        if task and task["id"] in self.expanded:
+            self.expanded.discard(task["id"])
+            self.forget_children(item)
+            self.tree.insert(item, tk.END)
+
+    def show_stats(self):
+        """Панель статистики по готовым счетчикам индекса и событий"""
+        stats = self.index.stats
+        stats_window = self.open_dialog("stats", "Статистика", "300x360")
+        stats_window.attributes('-topmost', True)
+
+        counters = self.render_counters
+        summary = (
+            f"Открытых задач: {stats.open_count}\n"
+            f"Выполненных задач: {stats.completed_count}\n"
+            f"Средний возраст открытых задач: {stats.average_open_age():.1f} дн.\n"
+            f"Перерисовок списка: {counters['rendered']} "
+            f"(объединено запросов: {counters['coalesced']})"
+        )
+        ttk.Label(stats_window, text=summary, justify=tk.LEFT, padding=5).pack(fill=tk.X)
+
+        table = ttk.Treeview(stats_window, columns=("Day", "Added", "Completed"), show="headings", height=10)
+        table.heading("Day", text="День")
+        table.heading("Added", text="Добавлено")
+        table.heading("Completed", text="Выполнено")
+        table.column("Day", width=100, anchor=tk.CENTER)
+        table.column("Added", width=80, anchor=tk.CENTER)
+        table.column("Completed", width=80, anchor=tk.CENTER)
+        for day, added, completed in self.activity.daily():
+            table.insert("", tk.END, values=(day, added, completed))
+        table.pack(fill=tk.BOTH, expand=True, padx=5)
+
+        ttk.Button(stats_window, text="Закрыть", command=lambda: self.close_dialog("stats")).pack(pady=5)
+
+    def record_history(self):
+        """Запись версии в историю; ошибка истории не мешает сохранению"""
+        try:
+            version = self.history.record(self.tasks)
+            if version:
+                self.logger.debug(f"Записана версия истории {version['root'][:12]} ({version['count']} задач)")
+        except Exception as e:
+            self.logger.error(f"Ошибка при записи истории версий: {str(e)}")
+
+    def prune_history(self):
+        """Удаление версий по истечении срока хранения"""
+        try:
+            removed = self.history.prune(
+                keep_all_hours=self.settings["history_keep_all_hours"],
+                keep_days=self.settings["history_keep_days"]
+            )
+            if removed:
+                self.logger.info(f"Из истории удалено устаревших версий: {removed}")
+        except Exception as e:
+            self.logger.error(f"Ошибка при очистке истории версий: {str(e)}")
+        # Long sessions keep saving, so retention is applied periodically
+        self.root.after(HISTORY_PRUNE_INTERVAL, self.prune_history)
+
+    def show_history(self):
+        """Окно истории версий с восстановлением выбранной версии"""
+        try:
+            versions = list(reversed(self.history.versions()))
+        except Exception as e:
+            self.logger.error(f"Ошибка при чтении истории версий: {str(e)}")
+            messagebox.showerror("Ошибка", f"Не удалось прочитать историю версий: {str(e)}")
+            return
+        if not versions:
+            messagebox.showinfo("История версий", "История версий пока пуста.")
+            return
+
+        history_window = self.open_dialog("history", "История версий", "300x300")
+        history_window.attributes('-topmost', True)
+
+        listbox = tk.Listbox(history_window)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for version in versions:
+            listbox.insert(tk.END, f"{version['time']}  -  задач: {version['count']}")
+
+        def restore():
+            selection = listbox.curselection()
+            if not selection:
+                return
+            version = versions[selection[0]]
+            if not messagebox.askyesno(
+                    "Подтверждение",
+                    f"Восстановить список задач на {version['time']}? Текущий список останется в истории.",
+                    parent=history_window):
+                return
+            try:
+                tasks = self.history.load(version["root"])
+            except Exception as e:
+                self.logger.error(f"Ошибка при восстановлении версии {version['root']}: {str(e)}")
+                messagebox.showerror("Ошибка", f"Не удалось восстановить версию: {str(e)}", parent=history_window)
+                return
+            self.tasks = tasks
+            self.expanded.clear()
+            # An open edit dialog would point at a task of the replaced list
+            self.close_dialog("edit")
+            self.prepare_tasks()
+            self.logger.info(f"Восстановлена версия от {version['time']} ({len(tasks)} задач)")
+            self.save_tasks()
+            self.schedule_refresh()
+            self.close_dialog("history")
+
+        buttons = ttk.Frame(history_window)
+        buttons.pack(pady=5)
+        ttk.Button(buttons, text="Восстановить", command=restore).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Закрыть", command=lambda: self.close_dialog("history")).pack(side=tk.LEFT, padx=5)
+
+    def load_settings(self):
+        """Загрузка настроек приложения
+
+        Настройки читаются до настройки логирования, поэтому вместе с ними
+        возвращается список замечаний (уровень, сообщение) для записи в лог.
+        """
+        settings = dict(DEFAULT_SETTINGS)
+        problems = []
+        settings_file = os.path.join(self.data_dir, 'settings.json')
+        try:
+            if os.path.exists(settings_file):
+                with open(settings_file, 'r', encoding='utf-8') as f:
+                    settings.update(json.load(f))
+        except Exception as e:
+            problems.append((logging.ERROR, f"Ошибка при загрузке настроек: {str(e)}"))
+        if settings["log_format"] not in LOG_FORMATS:
+            problems.append((logging.WARNING, f"Неизвестный формат лога: {settings['log_format']}"))
+            settings["log_format"] = DEFAULT_SETTINGS["log_format"]
+        if settings["durability"] not in DURABILITY_LEVELS:
+            problems.append((logging.WARNING, f"Неизвестный уровень надежности: {settings['durability']}"))
+            settings["durability"] = DEFAULT_SETTINGS["durability"]
+        for name in ("generations", "history_keep_all_hours", "history_keep_days"):
+            if not isinstance(settings[name], int) or settings[name] < 0:
+                problems.append((logging.WARNING, f"Некорректное значение настройки {name}: {settings[name]}"))
+                settings[name] = DEFAULT_SETTINGS[name]
+        return settings, problems
 
     def save_tasks(self):
         try:
-            # Create backup of existing file if it exists
-            if os.path.exists(self.tasks_file):
-                try:
-                    shutil.copy2(self.tasks_file, self.backup_file)
-                    self.logger.debug("Создана резервная копия файла задач")
-                except Exception as e:
-                    error_msg = f"Не удалось создать резервную копию: {str(e)}"
-                    self.logger.error(error_msg)
-                    messagebox.showwarning("Предупреждение", error_msg)
-            
-            # Ensure the directory exists
-            os.makedirs(self.data_dir, exist_ok=True)
-            
-            # Write to a temporary file first
-            temp_file = os.path.join(self.data_dir, "tasks_temp.json")
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
-            
-            # If successful, rename the temp file to the actual file
-            if os.path.exists(self.tasks_file):
-                os.remove(self.tasks_file)
-            os.rename(temp_file, self.tasks_file)
+            self.storage.save(self.tasks)
             self.logger.debug("Задачи успешно сохранены")
+            self.activity.save()
+            self.record_history()
             
         except PermissionError as e:
             error_msg = "Нет прав доступа для сохранения файла. Попробуйте запустить программу от имени администратора."
@@ -336,22 +2665,21 @@ class TodoApp:
 
     def load_tasks(self):
         try:
-            if os.path.exists(self.tasks_file):
-                with open(self.tasks_file, "r", encoding="utf-8") as f:
-                    self.tasks = json.load(f)
+            tasks, source = self.storage.load()
+            if tasks is not None:
+                self.tasks = tasks
+                if source in (self.tasks_file, self.storage.temp_path):
                     self.logger.info(f"Загружено {len(self.tasks)} задач из основного файла")
-            elif os.path.exists(self.backup_file):
-                # Try to load from backup if main file is corrupted
-                with open(self.backup_file, "r", encoding="utf-8") as f:
-                    self.tasks = json.load(f)
-                    self.logger.info(f"Загружено {len(self.tasks)} задач из резервной копии")
-                messagebox.showinfo("Восстановление", "Данные восстановлены из резервной копии.")
+                else:
+                    # Try to load from backup if main file is corrupted
+                    self.logger.info(f"Загружено {len(self.tasks)} задач из резервной копии {source}")
+                    messagebox.showinfo("Восстановление", "Данные восстановлены из резервной копии.")
         except PermissionError as e:
             self.logger.error(f"Ошибка прав доступа при загрузке: {str(e)}")
             messagebox.showerror("Ошибка", "Нет прав доступа для чтения файла.")
             self.tasks = []
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Ошибка формата JSON при загрузке: {str(e)}")
+        except SnapshotError as e:
+            self.logger.error(f"Ошибка проверки файлов задач при загрузке: {str(e)}")
             messagebox.showerror("Ошибка", "Файл с задачами поврежден. Создан новый список задач.")
             self.tasks = []
         except Exception as e:
@@ -387,7 +2715,10 @@ class TodoApp:
             messagebox.showerror("Ошибка", "Не удалось свернуть окно")
 
     def create_tray_window(self):
-        """Создание окна в трее"""
+        """Создание окна в трее (один раз, затем оно только скрывается и показывается)"""
+        if self.tray is not None:
+            self.tray.deiconify()
+            return
         self.tray = tk.Toplevel(self.root)
         self.tray.overrideredirect(True)
         self.tray.geometry("32x32")
@@ -411,14 +2742,14 @@ class TodoApp:
         """Восстановление окна из трея"""
         try:
             if self.is_minimized:
-                if hasattr(self, 'tray'):
-                    self.tray.destroy()
+                if self.tray is not None:
+                    self.tray.withdraw()
                 self.root.deiconify()
                 if self.last_geometry:
                     self.root.geometry(self.last_geometry)
                 self.is_minimized = False
                 self.root.attributes('-topmost', True)
-                self.root.update()
+                self.root.update_idletasks()
                 self.root.after(10, lambda: self.root.attributes('-topmost', False))
         except Exception as e:
             self.logger.error(f"Ошибка при восстановлении окна: {str(e)}")
@@ -484,6 +2815,61 @@ class TodoApp:
             self.root.geometry(f"300x400+{screen_width-320}+20")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Список задач")
+    parser.add_argument("--bench-storage", type=int, metavar="N",
+                        help="замерить скорость сохранения и загрузки N задач без запуска интерфейса")
+    parser.add_argument("--analyze-logs", nargs="?", const=True, metavar="DIR",
+                        help="проанализировать логи (по умолчанию ~/todo_app_data) без запуска интерфейса")
+    parser.add_argument("--export", metavar="FILE",
+                        help="экспортировать задачи в FILE (.csv, .md или .ics) без запуска интерфейса")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS),
+                        help="формат экспорта (по умолчанию - по расширению файла)")
+    parser.add_argument("--status", choices=EXPORT_STATUSES, default="all",
+                        help="экспортировать все, только открытые или только выполненные задачи")
+    parser.add_argument("--from", dest="date_from", metavar="ГГГГ-ММ-ДД", help="начальная дата задач")
+    parser.add_argument("--to", dest="date_to", metavar="ГГГГ-ММ-ДД", help="конечная дата задач")
+    parser.add_argument("--soak", type=int, metavar="N",
+                        help="прогнать N циклов работы с интерфейсом и проверить утечки (для CI - под xvfb-run)")
+    args = parser.parse_args()
+    if args.soak:
+        sys.exit(0 if soak_test(args.soak) else 1)
+    if args.bench_storage:
+        benchmark_storage(args.bench_storage)
+        sys.exit(0)
+    if args.analyze_logs:
+        log_dir = os.path.join(os.path.expanduser("~"), "todo_app_data") if args.analyze_logs is True else args.analyze_logs
+        try:
+            report = analyze_log_events(parse_log_events(iter_log_files(log_dir)))
+        except OSError as e:
+            print(f"Не удалось прочитать логи: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+        print(format_log_report(report))
+        sys.exit(0)
+
+    if args.export:
+        data_dir = os.path.join(os.path.expanduser("~"), "todo_app_data")
+        settings = dict(DEFAULT_SETTINGS)
+        try:
+            with open(os.path.join(data_dir, "settings.json"), "r", encoding="utf-8") as f:
+                settings.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        store = SnapshotStore(os.path.join(data_dir, "tasks.json"), generations=settings["generations"])
+        try:
+            # Same fallback as the app: temp file of an interrupted save, then older generations
+            source = store.source()
+            if source is None:
+                raise SnapshotError("задачи еще не сохранялись")
+            if source != store.path:
+                print(f"Основной файл задач недоступен, используется {source}", file=sys.stderr)
+            tasks = store.scan(source, predicate=task_filter(args.status, args.date_from, args.date_to))
+            count = export_tasks(tasks, args.export, args.format)
+        except (OSError, ValueError, SnapshotError) as e:
+            print(f"Не удалось экспортировать задачи: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Экспортировано задач: {count}")
+        sys.exit(0)
+
     try:
         root = tk.Tk()
         app = TodoApp(root)
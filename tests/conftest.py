@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import todo_app  # noqa: E402
+
+
+class FakeMessagebox:
+    """Замена tkinter.messagebox, запоминающая показанные сообщения"""
+
+    def __init__(self):
+        self.shown = []
+
+    def record(self, kind, answer=None):
+        def show(title, message, **options):
+            self.shown.append((kind, title, message))
+            return answer
+        return show
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name.startswith("ask"):
+            return self.record(name, answer=True)
+        return self.record(name)
+
+    def errors(self):
+        return [item for item in self.shown if item[0] == "showerror"]
+
+
+@pytest.fixture
+def fake_messagebox(monkeypatch):
+    fake = FakeMessagebox()
+    monkeypatch.setattr(todo_app, "messagebox", fake)
+    return fake
@@ -0,0 +1,37 @@
+"""Экспорт задач: поля iCalendar"""
+from todo_app import export_icalendar
+
+
+def vtodo_lines(task):
+    text = "".join(export_icalendar([task]))
+    return text.replace("\r\n ", "").split("\r\n")
+
+
+def test_plain_task_has_due_and_utc_stamp():
+    lines = vtodo_lines({"id": 1, "text": "Задача", "date": "2024-01-31", "priority": "high", "tags": []})
+    assert "DUE;VALUE=DATE:20240131" in lines
+    assert not any(line.startswith("DTSTART") for line in lines)
+    stamp = next(line for line in lines if line.startswith("DTSTAMP:"))
+    assert stamp.endswith("Z") and len(stamp) == len("DTSTAMP:20240131T120000Z")
+
+
+def test_recurring_task_has_dtstart_without_due():
+    lines = vtodo_lines({"id": 1, "text": "Отчет", "date": "2024-01-31", "recurrence": "FREQ=MONTHLY;BYMONTHDAY=31"})
+    assert "DTSTART;VALUE=DATE:20240131" in lines
+    assert "RRULE:FREQ=MONTHLY;BYMONTHDAY=31" in lines
+    assert not any(line.startswith("DUE") for line in lines)
+
+
+def test_invalid_stored_rule_is_left_out():
+    lines = vtodo_lines({"id": 1, "text": "Старое", "date": "2024-01-31", "recurrence": "FREQ=DAILY;BYDAY=MO"})
+    assert not any(line.startswith("RRULE") for line in lines)
+    assert "DUE;VALUE=DATE:20240131" in lines
+
+
+def test_text_is_escaped_and_folded():
+    text = "Купить; молоко, хлеб\\сыр " * 5
+    exported = "".join(export_icalendar([{"id": 7, "text": text, "parent": 3}]))
+    assert all(len(line.encode("utf-8")) <= 75 for line in exported.split("\r\n"))
+    lines = exported.replace("\r\n ", "").split("\r\n")
+    assert "SUMMARY:" + text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,") in lines
+    assert "RELATED-TO:todo-3@todo_app" in lines
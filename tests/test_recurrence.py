@@ -0,0 +1,93 @@
+"""Правила повторения: разбор RRULE и даты следующих экземпляров"""
+from datetime import date
+
+import pytest
+
+from todo_app import RecurrenceRule
+
+
+def series(rule_text, start, count):
+    """Первые count дат серии, начиная с start (включительно)"""
+    rule = RecurrenceRule.parse(rule_text)
+    dates = [start]
+    while len(dates) < count:
+        following = rule.step(dates[-1])
+        if following is None:
+            break
+        dates.append(following)
+    return dates
+
+
+@pytest.mark.parametrize("rule, start, expected", [
+    ("FREQ=DAILY", date(2024, 2, 28), [date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]),
+    ("FREQ=DAILY;INTERVAL=10", date(2024, 12, 25), [date(2024, 12, 25), date(2025, 1, 4), date(2025, 1, 14)]),
+    ("FREQ=WEEKLY", date(2024, 1, 1), [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)]),
+    ("FREQ=WEEKLY;BYDAY=MO,FR", date(2024, 1, 1),
+     [date(2024, 1, 1), date(2024, 1, 5), date(2024, 1, 8), date(2024, 1, 12)]),
+    ("FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH", date(2024, 1, 4),
+     [date(2024, 1, 4), date(2024, 1, 16), date(2024, 1, 18), date(2024, 1, 30)]),
+    # RFC 5545: months without the 31st are skipped, the day never drifts
+    ("FREQ=MONTHLY", date(2024, 1, 31), [date(2024, 1, 31), date(2024, 3, 31), date(2024, 5, 31)]),
+    ("FREQ=MONTHLY;BYMONTHDAY=31", date(2024, 1, 31),
+     [date(2024, 1, 31), date(2024, 3, 31), date(2024, 5, 31), date(2024, 7, 31), date(2024, 8, 31)]),
+    ("FREQ=MONTHLY;BYMONTHDAY=30", date(2024, 1, 30), [date(2024, 1, 30), date(2024, 3, 30), date(2024, 4, 30)]),
+    ("FREQ=MONTHLY;BYMONTHDAY=29", date(2023, 1, 29), [date(2023, 1, 29), date(2023, 3, 29)]),
+    ("FREQ=MONTHLY;BYMONTHDAY=29", date(2024, 1, 29), [date(2024, 1, 29), date(2024, 2, 29), date(2024, 3, 29)]),
+    ("FREQ=MONTHLY;INTERVAL=3", date(2024, 11, 15), [date(2024, 11, 15), date(2025, 2, 15), date(2025, 5, 15)]),
+    ("FREQ=MONTHLY;BYMONTHDAY=5", date(2024, 1, 20), [date(2024, 1, 20), date(2024, 2, 5), date(2024, 3, 5)]),
+])
+def test_step(rule, start, expected):
+    assert series(rule, start, len(expected)) == expected
+
+
+def test_step_never_matching_day_ends_series():
+    # Every 12 months from February: the 30th never exists
+    assert RecurrenceRule.parse("FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=30").step(date(2024, 2, 1)) is None
+    assert RecurrenceRule.parse("FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=30").advance(
+        date(2024, 2, 1), date(2024, 2, 1)) is None
+
+
+def test_advance_count_consumes_occurrences():
+    rule = RecurrenceRule.parse("FREQ=MONTHLY;COUNT=3")
+    following, rule = rule.advance(date(2024, 1, 31), date(2024, 1, 31))
+    assert following == date(2024, 3, 31) and rule.count == 2
+    following, rule = rule.advance(following, following)
+    assert following == date(2024, 5, 31) and rule.count == 1
+    assert rule.advance(following, following) is None
+
+
+def test_advance_skips_missed_occurrences_up_to_today():
+    rule = RecurrenceRule.parse("FREQ=DAILY;COUNT=10")
+    following, rest = rule.advance(date(2024, 1, 1), date(2024, 1, 5))
+    assert following == date(2024, 1, 5)
+    # Four steps were taken, each one used up an occurrence
+    assert rest.count == 6
+    assert rule.advance(date(2024, 1, 1), date(2024, 1, 20)) is None
+
+
+def test_advance_stops_after_until():
+    rule = RecurrenceRule.parse("FREQ=WEEKLY;UNTIL=20240115")
+    assert rule.advance(date(2024, 1, 1), date(2024, 1, 1))[0] == date(2024, 1, 8)
+    assert rule.advance(date(2024, 1, 8), date(2024, 1, 8))[0] == date(2024, 1, 15)
+    assert rule.advance(date(2024, 1, 15), date(2024, 1, 15)) is None
+
+
+@pytest.mark.parametrize("text", [
+    "FREQ=YEARLY",
+    "FREQ=DAILY;BYDAY=MO",
+    "FREQ=MONTHLY;BYDAY=MO",
+    "FREQ=WEEKLY;BYMONTHDAY=3",
+    "FREQ=MONTHLY;BYMONTHDAY=32",
+    "FREQ=WEEKLY;BYDAY=XX",
+    "FREQ=DAILY;INTERVAL=0",
+    "FREQ=DAILY;COUNT=x",
+    "FREQ=DAILY;BYHOUR=9",
+])
+def test_parse_rejects(text):
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse(text)
+
+
+def test_parse_round_trip():
+    text = "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR;COUNT=5;UNTIL=20241231"
+    assert str(RecurrenceRule.parse("rrule:" + text.lower().replace("byday=mo,fr", "byday=fr,mo"))) == text
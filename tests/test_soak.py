@@ -0,0 +1,16 @@
+"""Короткий прогон интерфейса на утечки (нужен X-сервер, например xvfb-run)"""
+import os
+import sys
+
+import pytest
+
+import todo_app
+
+
+@pytest.mark.skipif(sys.platform.startswith("linux") and not os.environ.get("DISPLAY"),
+                    reason="нет X-сервера; запустите под xvfb-run")
+def test_soak_finds_no_leaks(fake_messagebox, capsys):
+    home = os.environ.get("HOME")
+    assert todo_app.soak_test(40, warmup=20), capsys.readouterr()
+    assert os.environ.get("HOME") == home
+    assert not fake_messagebox.shown
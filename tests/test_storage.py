@@ -0,0 +1,326 @@
+"""Проверка сохранения задач: сбои на каждом шаге ввода-вывода, поврежденные
+файлы и свойства круговой записи-чтения на случайных списках задач"""
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+
+import pytest
+
+import todo_app
+from todo_app import SnapshotStore, TodoApp
+
+
+class InjectedFault(OSError):
+    pass
+
+
+class FaultyFile:
+    """Файл, у которого запись обрывается на середине по команде инжектора"""
+
+    def __init__(self, file, injector):
+        self.file = file
+        self.injector = injector
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def write(self, data):
+        if self.injector.step("write"):
+            # A torn write: half of the data reaches the file
+            self.file.write(data[:len(data) // 2])
+            raise InjectedFault("write")
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class FaultInjector:
+    """Считает шаги ввода-вывода при сохранении и роняет заданный шаг"""
+
+    def __init__(self, monkeypatch):
+        self.fail_at = None
+        self.steps = []
+        real_open = open
+
+        def faulty_open(path, mode="r", *args, **kwargs):
+            if "w" not in mode:
+                return real_open(path, mode, *args, **kwargs)
+            if self.step("open"):
+                raise InjectedFault("open")
+            return FaultyFile(real_open(path, mode, *args, **kwargs), self)
+
+        monkeypatch.setattr(todo_app, "open", faulty_open, raising=False)
+        for module, name in ((os, "replace"), (os, "fsync"), (os, "link"),
+                             (os, "remove"), (shutil, "copyfile")):
+            self.wrap(monkeypatch, module, name)
+
+    def wrap(self, monkeypatch, module, name):
+        real = getattr(module, name)
+
+        def faulty(*args, **kwargs):
+            if self.step(name):
+                raise InjectedFault(name)
+            return real(*args, **kwargs)
+
+        monkeypatch.setattr(module, name, faulty)
+
+    def step(self, name):
+        self.steps.append(name)
+        return len(self.steps) - 1 == self.fail_at
+
+    def arm(self, fail_at):
+        self.fail_at = fail_at
+        self.steps = []
+
+
+class FakeApp:
+    """Минимальное окружение для методов сохранения TodoApp без окна Tk"""
+
+    save_tasks = TodoApp.save_tasks
+    load_tasks = TodoApp.load_tasks
+
+    def __init__(self, directory, durability="normal", generations=3):
+        self.tasks_file = os.path.join(directory, "tasks.json")
+        self.logger = logging.getLogger("todo_app")
+        self.storage = SnapshotStore(self.tasks_file, generations=generations,
+                                     durability=durability, logger=self.logger)
+        self.activity = todo_app.TaskActivity(os.path.join(directory, "stats.json"), logger=self.logger)
+        self.tasks = []
+
+    def record_history(self):
+        pass
+
+
+def random_text(rng):
+    alphabet = "abcXYZ абвЖЯ 0123 \"\\/\t\n{}[],:ёЁ✓😀"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+
+
+def random_tasks(rng):
+    """Произвольный список задач, включая редкие символы и вложенные поля"""
+    tasks = []
+    for task_id in range(1, rng.randint(0, 40) + 1):
+        task = {
+            "id": task_id,
+            "text": random_text(rng),
+            "completed": rng.random() < 0.5,
+            "date": f"20{rng.randint(0, 99):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "priority": rng.choice(todo_app.PRIORITIES),
+            "tags": [random_text(rng) for _ in range(rng.randint(0, 3))],
+        }
+        if rng.random() < 0.3:
+            task["parent"] = rng.randint(1, task_id)
+        if rng.random() < 0.3:
+            task["extra"] = {"n": rng.uniform(-1e9, 1e9), "list": [None, True, rng.randint(-5, 5)]}
+        tasks.append(task)
+    return tasks
+
+
+def save_and_crash(directory, durability, fail_at, old, new, fake_messagebox, monkeypatch):
+    """Сохранение new поверх old с отказом на шаге fail_at, возвращает число шагов"""
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    app = FakeApp(directory, durability)
+    for tasks in old:
+        app.tasks = tasks
+        app.save_tasks()
+    with monkeypatch.context() as patch:
+        injector = FaultInjector(patch)
+        injector.arm(fail_at)
+        app.tasks = new
+        app.save_tasks()
+    return injector
+
+
+@pytest.mark.parametrize("durability", todo_app.DURABILITY_LEVELS)
+def test_crash_at_every_step_loads_old_or_new(tmp_path, durability, fake_messagebox, monkeypatch):
+    rng = random.Random(durability)
+    history = [random_tasks(rng) for _ in range(4)]
+    new = random_tasks(rng)
+    directory = str(tmp_path / "data")
+
+    injector = save_and_crash(directory, durability, None, history, new, fake_messagebox, monkeypatch)
+    steps = len(injector.steps)
+    assert steps >= 4
+    for fail_at in range(steps):
+        fake_messagebox.shown.clear()
+        injector = save_and_crash(directory, durability, fail_at, history, new, fake_messagebox, monkeypatch)
+        failed = injector.steps[fail_at]
+        # A failed hard link is handled by copying, every other fault is reported
+        reported = len(fake_messagebox.errors())
+        assert reported == (failed != "link"), failed
+        # tasks.json must never be missing, whatever step failed
+        assert os.path.exists(os.path.join(directory, "tasks.json")), failed
+
+        app = FakeApp(directory, durability)
+        app.load_tasks()
+        assert app.tasks in (history[-1], new), failed
+        assert len(fake_messagebox.errors()) == reported, failed
+
+        # The next save after recovery must win and keep its predecessor
+        newer = random_tasks(rng)
+        app.tasks = newer
+        app.save_tasks()
+        reloaded = FakeApp(directory, durability)
+        reloaded.load_tasks()
+        assert reloaded.tasks == newer, failed
+        assert reloaded.storage.read(reloaded.storage.generation_path(1))[1] in (history[-1], new), failed
+
+
+def test_crash_after_recovered_temp_file_keeps_newest(tmp_path, fake_messagebox, monkeypatch):
+    directory = str(tmp_path)
+    app = FakeApp(directory)
+    app.tasks = [{"id": 1, "text": "старая"}]
+    app.save_tasks()
+    # A save that wrote the temp file and died before the rename
+    with monkeypatch.context() as patch:
+        injector = FaultInjector(patch)
+        injector.arm(None)
+        app.tasks = [{"id": 1, "text": "новая"}]
+        app.save_tasks()
+        rename = injector.steps.index("replace")
+    save_and_crash(directory, "normal", rename, [[{"id": 1, "text": "старая"}]],
+                   [{"id": 1, "text": "новая"}], fake_messagebox, monkeypatch)
+    recovered = FakeApp(directory)
+    recovered.load_tasks()
+    assert recovered.tasks == [{"id": 1, "text": "новая"}]
+    assert not os.path.exists(recovered.storage.temp_path)
+
+    # The following save tears its write to the temp file (step 0 is open)
+    with monkeypatch.context() as patch:
+        FaultInjector(patch).arm(1)
+        recovered.tasks = [{"id": 1, "text": "третья"}]
+        recovered.save_tasks()
+    after = FakeApp(directory)
+    after.load_tasks()
+    assert after.tasks in ([{"id": 1, "text": "новая"}], [{"id": 1, "text": "третья"}])
+
+
+def test_permission_error_reports_and_keeps_old(tmp_path, fake_messagebox, monkeypatch):
+    app = FakeApp(str(tmp_path))
+    app.tasks = [{"id": 1, "text": "задача"}]
+    app.save_tasks()
+
+    def denied(*args, **kwargs):
+        raise PermissionError("denied")
+
+    monkeypatch.setattr(os, "replace", denied)
+    app.tasks = [{"id": 2, "text": "другая"}]
+    app.save_tasks()
+    monkeypatch.undo()
+    assert "прав доступа" in fake_messagebox.errors()[0][2]
+    loaded = FakeApp(str(tmp_path))
+    loaded.load_tasks()
+    assert loaded.tasks in ([{"id": 1, "text": "задача"}], [{"id": 2, "text": "другая"}])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_corrupted_main_file_falls_back_to_valid_generation(tmp_path, seed, fake_messagebox):
+    rng = random.Random(seed)
+    app = FakeApp(str(tmp_path))
+    saved = [random_tasks(rng) for _ in range(3)]
+    for tasks in saved:
+        app.tasks = tasks
+        app.save_tasks()
+    with open(app.tasks_file, "rb") as f:
+        data = bytearray(f.read())
+    if rng.random() < 0.5:
+        data = data[:rng.randrange(len(data))]
+    else:
+        position = rng.randrange(len(data))
+        data[position] = (data[position] + rng.randint(1, 255)) % 256
+    with open(app.tasks_file, "wb") as f:
+        f.write(bytes(data))
+
+    loaded = FakeApp(str(tmp_path))
+    loaded.load_tasks()
+    # A flipped byte may land in whitespace and leave the snapshot valid
+    assert loaded.tasks in (saved[-1], saved[-2])
+    assert not fake_messagebox.errors()
+
+
+def test_all_snapshots_corrupted_starts_empty(tmp_path, fake_messagebox):
+    app = FakeApp(str(tmp_path))
+    for number in range(3):
+        app.tasks = [{"id": number}]
+        app.save_tasks()
+    for path in app.storage.candidates():
+        if os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('{"version": 2, "generation": 1, "checksum": "0", "tasks": []')
+    loaded = FakeApp(str(tmp_path))
+    loaded.load_tasks()
+    assert loaded.tasks == []
+    assert len(fake_messagebox.errors()) == 1
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_round_trip_random_task_lists(tmp_path, seed):
+    rng = random.Random(seed)
+    store = SnapshotStore(str(tmp_path / "tasks.json"), generations=rng.randint(0, 4),
+                          durability=rng.choice(todo_app.DURABILITY_LEVELS))
+    saved = []
+    for _ in range(rng.randint(1, 6)):
+        tasks = random_tasks(rng)
+        store.save(tasks)
+        saved.append(tasks)
+        assert SnapshotStore(store.path).load()[0] == tasks
+        assert list(store.scan(chunk_size=rng.randint(1, 256))) == tasks
+    for number in range(1, min(store.generations, len(saved) - 1) + 1):
+        assert store.read(store.generation_path(number))[1] == saved[-1 - number]
+
+
+@pytest.mark.parametrize("damage", ["none", "main", "main_and_first", "temp"])
+def test_source_matches_load(tmp_path, damage):
+    store = SnapshotStore(str(tmp_path / "tasks.json"))
+    for number in range(5):
+        store.save([{"id": number}])
+    if damage == "temp":
+        # The newest snapshot is left in the temp file by an interrupted save
+        os.replace(store.path, store.temp_path)
+        shutil.copyfile(store.generation_path(1), store.path)
+    for path in {"main": [store.path], "main_and_first": [store.path, store.generation_path(1)]}.get(damage, []):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"version": 2, "generation": 0, "checksum": "bad"')
+    source = SnapshotStore(store.path).source()
+    generation, tasks, path = SnapshotStore(store.path).newest(store.read)
+    assert source == path
+    assert list(store.scan(source)) == tasks
+
+
+def test_version_1_snapshot_still_loads(tmp_path):
+    tasks = [{"id": 1, "text": "Задача", "tags": ["дом"]}]
+    payload = json.dumps(tasks, ensure_ascii=False, indent=2)
+    snapshot = {
+        "version": 1,
+        "generation": 4,
+        "checksum": hashlib.sha256(payload.encode("utf-8")).hexdigest(),
+        "tasks": tasks,
+    }
+    path = tmp_path / "tasks.json"
+    path.write_text(json.dumps(snapshot, ensure_ascii=False, indent=2), encoding="utf-8")
+    store = SnapshotStore(str(path))
+    assert store.load() == (tasks, str(path))
+    store.save(tasks + [{"id": 2}])
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["version"] == todo_app.SNAPSHOT_VERSION
+    assert store.read(store.generation_path(1)) == (4, tasks)
+
+
+def test_legacy_list_file_loads(tmp_path):
+    path = tmp_path / "tasks.json"
+    path.write_text('[{"id": 1, "text": "old"}]', encoding="utf-8")
+    assert SnapshotStore(str(path)).load() == ([{"id": 1, "text": "old"}], str(path))
+
+
+def test_benchmark_storage_runs(capsys):
+    todo_app.benchmark_storage(200, rounds=1)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines] == list(todo_app.DURABILITY_LEVELS)